@@ -0,0 +1,103 @@
+"""Microbenchmark: per-span Python heading loop vs vectorized classify_spans on a synthetic span table.
+
+Usage: python benchmarks/bench_classify.py [--spans 1000000] [--toc 2000]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1a_structure_extractor as r1a
+
+SPANS_PER_PAGE = 50
+
+
+def synthetic_span_table(n, seed=0):
+    # Mostly 10pt body text, with bold numbered 14pt/18pt headings at the left margin
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(3, size=n, p=[0.9, 0.07, 0.03])
+    size = np.array([10.0, 14.0, 18.0], dtype=np.float32)[kind]
+    bold = kind > 0
+    left = np.where(kind > 0, 36.0, rng.choice([72.0, 90.0, 108.0], size=n)).astype(np.float32)
+    page = (np.arange(n) // SPANS_PER_PAGE).astype(np.int32)
+    row = np.arange(n) % SPANS_PER_PAGE
+    top = (60 + row * 14 + np.where(kind > 0, 10, 0)).astype(np.float32)
+    bbox = np.column_stack([left, top, left + 200, top + size]).astype(np.float32)
+    line_y = np.column_stack([top, top + size]).astype(np.float32)
+    words = ['energy', 'climate', 'policy', 'carbon', 'market', 'review', 'data', 'model']
+    texts = []
+    for i in range(n):
+        if kind[i] == 0:
+            texts.append(f'{words[i % 8]} {words[(i * 7) % 8]} text')
+        else:
+            texts.append(f'{i % 97}. {words[i % 8].capitalize()}')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    return r1a.SpanTable(size, bold, bbox, line_y, page, offsets, ''.join(texts), int(page[-1]) + 1)
+
+
+def legacy_classify(spans, cluster_centers, body_font_size, toc_headings):
+    # The span-by-span loop process_pdf used before classify_spans (including the linear TOC scan)
+    headings = []
+    for p in range(spans.num_pages):
+        start, end = spans.page_range(p)
+        prev_bottom = 0
+        for i in range(start, end):
+            text = spans.span_text(i)
+            if not text or len(text) < 2:
+                continue
+            font_size = float(spans.size[i])
+            left = float(spans.bbox[i, 0])
+            spacing = (float(spans.line_y[i, 0]) - prev_bottom) if prev_bottom else 0
+            prev_bottom = float(spans.line_y[i, 1])
+            lang = r1a.detect_language(text)
+            explanation = []
+            level = r1a.guess_heading_level_cluster(font_size, cluster_centers)
+            if level != 'BODY':
+                explanation.append(f'Clustered as {level} (font size {font_size:.1f})')
+            if left < r1a.LEFT_MARGIN_THRESHOLD:
+                explanation.append(f'Near left margin ({left:.1f}px)')
+            if spacing > body_font_size * r1a.LINE_SPACING_THRESHOLD:
+                explanation.append(f'Extra spacing above ({spacing:.1f})')
+            if spans.bold[i]:
+                explanation.append('Font is bold')
+            if re.match(r'^(\d+\.|[A-Z]\.|[IVX]+\.)', text):
+                explanation.append('Matches numbered/section pattern')
+            toc_match = False
+            for toc in toc_headings:
+                if text.lower().strip() in toc.lower().strip():
+                    toc_match = True
+                    explanation.append('Found in TOC')
+                    break
+            signals = (level != 'BODY') + (left < r1a.LEFT_MARGIN_THRESHOLD) + (spacing > body_font_size * r1a.LINE_SPACING_THRESHOLD) + toc_match
+            if signals >= 2:
+                headings.append({'level': level, 'text': text, 'page': p, 'lang': lang, 'explanation': explanation})
+    return headings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spans', type=int, default=1_000_000)
+    parser.add_argument('--toc', type=int, default=200, help='TOC entries (the legacy scan is O(spans x TOC))')
+    args = parser.parse_args()
+    spans = synthetic_span_table(args.spans)
+    centers = np.array([18.0, 14.0, 10.0, 12.0])
+    toc_entries = [(1, f'{i}. Section {i}') for i in range(args.toc)]
+    toc_index = r1a.TocIndex(toc_entries)
+    toc_titles = [t for _, t in toc_entries]
+
+    t0 = time.perf_counter()
+    new = r1a.classify_spans(spans, centers, 10.0, toc_index)
+    t_new = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    old = legacy_classify(spans, centers, 10.0, toc_titles)
+    t_old = time.perf_counter() - t0
+    for h in new:
+        h.pop('toc_level', None)
+        h.pop('span', None)
+    print(f"spans={len(spans)} headings={len(new)} identical={new == old}")
+    print(f"per-span loop:  {t_old:.2f}s")
+    print(f"classify_spans: {t_new:.2f}s  ({t_old / t_new:.1f}x)")
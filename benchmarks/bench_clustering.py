@@ -0,0 +1,52 @@
+"""Time and peak traced memory: KMeans on every span vs weighted unique-row clustering.
+
+Usage: python benchmarks/bench_clustering.py [--spans 1000000]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from sklearn.cluster import KMeans
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1a_structure_extractor as r1a
+from bench_classify import synthetic_span_table
+
+
+def full_kmeans(spans):
+    # What process_pdf did before: fit on the raw (size, bold, left) row of every span
+    features = np.column_stack([spans.size, spans.bold, spans.bbox[:, 0]]).astype(np.float64)
+    kmeans = KMeans(n_clusters=r1a.KMEANS_CLUSTERS, random_state=42, n_init='auto')
+    kmeans.fit(features)
+    return kmeans.cluster_centers_[:, 0]
+
+
+def weighted_unique(spans, method):
+    r1a._center_cache.clear()
+    rows, counts = r1a.font_feature_histogram(spans)
+    return r1a.fit_cluster_centers(rows, counts, method=method)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    centers = fn(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024), np.sort(centers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spans', type=int, default=1_000_000)
+    args = parser.parse_args()
+    spans = synthetic_span_table(args.spans)
+    print(f"spans={len(spans)} unique rows={len(r1a.font_feature_histogram(spans)[0])}")
+    runs = [('full KMeans (before)', full_kmeans, spans)]
+    runs += [(f'weighted unique / {m}', weighted_unique, spans, m) for m in ('kmeans', 'minibatch', 'histogram')]
+    for name, fn, *fn_args in runs:
+        elapsed, peak_mb, centers = measure(fn, *fn_args)
+        print(f"{name:28s} {elapsed:7.3f}s  peak {peak_mb:7.1f}MB  centers {np.round(centers, 2)}")
@@ -0,0 +1,100 @@
+"""Embedding backends: startup time, RSS, texts/sec and ranking agreement with torch.
+
+Usage: python benchmarks/bench_embedding_backends.py [--model-dir path] [--onnx-dir path] [--texts 2000] [--queries 20]
+Each backend runs in a fresh interpreter, so startup includes imports and model load. The ONNX graphs
+are exported first if missing. Agreement: queries rank all section texts with each backend; top-1
+and top-10 overlap are compared against the torch ranking.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from synthetic import make_outline, WORDS
+
+
+def corpus(n_texts, n_queries):
+    texts = []
+    seed = 0
+    while len(texts) < n_texts:
+        texts.extend(s['text'] for s in make_outline(200, seed=seed)['outline'])
+        seed += 1
+    queries = [f'{WORDS[i % len(WORDS)]} analyst reviewing {WORDS[(5 * i) % len(WORDS)]} {WORDS[(11 * i) % len(WORDS)]}'
+               for i in range(n_queries)]
+    return queries, texts[:n_texts]
+
+
+def child(args):
+    # Runs in a fresh interpreter: time imports + load, then encode throughput
+    t0 = time.perf_counter()
+    import psutil
+    import round1b_persona_intelligence as r1b
+    model = r1b.load_model(args.model_dir, backend=args.child, onnx_dir=args.onnx_dir)
+    startup = time.perf_counter() - t0
+    rss_loaded = psutil.Process().memory_info().rss / (1024 * 1024)
+    queries, texts = corpus(args.texts, args.queries)
+    r1b.embed_text(model, texts[:8])  # warm-up
+    t0 = time.perf_counter()
+    vectors = np.asarray(r1b.embed_text(model, queries + texts, batch_size=r1b.ENCODE_BATCH_SIZE))
+    elapsed = time.perf_counter() - t0
+    np.save(args.out, vectors)
+    print(json.dumps({'startup_sec': startup, 'rss_mb': rss_loaded,
+                      'peak_rss_mb': psutil.Process().memory_info().rss / (1024 * 1024),
+                      'texts_per_sec': len(vectors) / elapsed}))
+
+
+def agreement(ref, vectors, n_queries, k=10):
+    def ranking(v):
+        v = v / np.linalg.norm(v, axis=1, keepdims=True)
+        return np.argsort(-(v[:n_queries] @ v[n_queries:].T), axis=1, kind='stable')
+    a, b = ranking(ref), ranking(vectors)
+    top1 = float(np.mean(a[:, 0] == b[:, 0]))
+    topk = float(np.mean([len(set(x[:k]) & set(y[:k])) / k for x, y in zip(a, b)]))
+    cos = float(np.mean(np.sum(ref * vectors, axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(vectors, axis=1))))
+    return top1, topk, cos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    parser.add_argument('--onnx-dir', default=None)
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'])
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        raise SystemExit(0)
+    import round1b_persona_intelligence as r1b
+    from onnx_embedder import export_onnx, is_exported
+    source = args.model_dir or r1b.MODEL_NAME
+    onnx_dir = args.onnx_dir or r1b.default_onnx_dir(source)
+    if not is_exported(onnx_dir, quantized=True):
+        export_onnx(source, onnx_dir)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out = os.path.join(tmp, f'{backend}.npy')
+            cmd = [sys.executable, __file__, '--child', backend, '--out', out, '--onnx-dir', onnx_dir,
+                   '--texts', str(args.texts), '--queries', str(args.queries)]
+            if args.model_dir:
+                cmd += ['--model-dir', args.model_dir]
+            proc = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=ROOT_DIR)
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            results[backend]['vectors'] = np.load(out)
+    ref = results.get('torch', {}).get('vectors')
+    for backend, r in results.items():
+        line = (f"{backend:10s} startup {r['startup_sec']:6.2f}s  RSS {r['rss_mb']:6.0f}MB (peak {r['peak_rss_mb']:6.0f}MB)  "
+                f"{r['texts_per_sec']:7.0f} texts/s")
+        if ref is not None and backend != 'torch':
+            top1, topk, cos = agreement(ref, r['vectors'], args.queries)
+            line += f"  vs torch: top-1 {top1:.2f}  top-10 overlap {topk:.2f}  mean cosine {cos:.5f}"
+        print(line)
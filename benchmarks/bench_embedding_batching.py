@@ -0,0 +1,61 @@
+"""Round 1B throughput: per-document encode calls (before) vs the two-phase corpus-wide pass.
+
+Usage: python benchmarks/bench_embedding_batching.py [--docs 200] [--sections 100] [--model-dir path]
+"""
+import os
+import sys
+import time
+import json
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1b_persona_intelligence as r1b
+from synthetic import make_outline
+
+
+class CountingModel:
+    # Wraps the encoder to count encode calls and texts
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        self.texts += len(texts)
+        return self.model.encode(texts, **kwargs)
+
+
+def per_document(input_dir, model, persona, job):
+    # The old process_persona loop: one rank call per JSON and one encode per top section
+    query_vec = r1b.embed_text(model, persona + " " + job)
+    for fname, doc in r1b.load_outlines(input_dir):
+        ranked = r1b.rank_sections(doc.get('outline', []), query_vec, model)
+        for s, _ in ranked[:3]:
+            r1b.analyze_subsections(s['text'], query_vec, model)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--sections', type=int, default=100)
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    args = parser.parse_args()
+    model = r1b.load_model(args.model_dir)
+    persona, job = 'Climate policy analyst', 'Summarize carbon market mechanisms'
+    with tempfile.TemporaryDirectory() as tmp:
+        in_dir = os.path.join(tmp, 'in')
+        os.makedirs(in_dir)
+        for i in range(args.docs):
+            with open(os.path.join(in_dir, f'doc{i}.json'), 'w', encoding='utf-8') as f:
+                json.dump(make_outline(args.sections, seed=i), f)
+        for name, run in (('per-document (before)', lambda m: per_document(in_dir, m, persona, job)),
+                          ('two-phase batched', lambda m: r1b.process_persona(in_dir, tmp, persona, job, model=m))):
+            counting = CountingModel(model)
+            t0 = time.perf_counter()
+            run(counting)
+            elapsed = time.perf_counter() - t0
+            print(f"{name:22s} {elapsed:7.2f}s  {counting.calls:6d} encode calls  "
+                  f"{counting.texts:7d} texts  {counting.texts / elapsed:8.0f} texts/s  "
+                  f"{args.docs * args.sections / elapsed:8.0f} sections/s")
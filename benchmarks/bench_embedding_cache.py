@@ -0,0 +1,52 @@
+"""EmbeddingStore.put on a cold store: one large batch of new texts, as on the first run over a corpus.
+
+Usage: python benchmarks/bench_embedding_cache.py [--sizes 20000 40000 200000] [--dim 384] [--max-growth 3]
+Appending is linear in the batch, so seconds per row should stay flat as the batch grows. The run fails
+(exit 1) when the largest batch costs more than --max-growth times the smallest per row, which catches a
+quadratic duplicate check. A second put of the same texts must append nothing.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from embedding_cache import EmbeddingStore
+
+
+def timed_put(n, dim):
+    texts = [f'sentence {i} about topic {i % 997}' for i in range(n)]
+    vectors = np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+    root = tempfile.mkdtemp(prefix='bench-embcache-')
+    try:
+        store = EmbeddingStore(root, 'bench-model')
+        t0 = time.perf_counter()
+        store.put(texts, vectors)
+        sec = time.perf_counter() - t0
+        store.put(texts, vectors)  # all duplicates
+        assert store.rows == n, f'{store.rows} rows after re-putting {n} texts'
+        return sec
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20_000, 40_000, 200_000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--max-growth', type=float, default=3.0)
+    args = parser.parse_args()
+    per_row = {}
+    for n in sorted(args.sizes):
+        sec = timed_put(n, args.dim)
+        per_row[n] = sec / n
+        print(f"put {n:8d} new texts: {sec:.3f}s  ({n / sec:,.0f} rows/s)")
+    small, large = min(per_row), max(per_row)
+    growth = per_row[large] / per_row[small]
+    if growth > args.max_growth:
+        print(f"[ERROR] per-row put cost grew {growth:.1f}x from {small} to {large} texts (limit {args.max_growth}x)")
+        raise SystemExit(1)
+    print(f"[INFO] per-row put cost {growth:.1f}x from {small} to {large} texts")
@@ -0,0 +1,61 @@
+"""/upload latency: subprocess-per-request (before) vs the in-process warm worker pool.
+
+Usage: python benchmarks/bench_frontend_latency.py [--requests 5]
+The cache is disabled and every upload is a distinct synthetic PDF, so every request really extracts.
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import argparse
+import subprocess
+import statistics
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'frontend'))
+from synthetic import make_pdf
+
+
+def subprocess_request(pdf_path, tmp):
+    # What /upload did before: a fresh interpreter running Round 1A over the uploads directory
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'round1a_structure_extractor.py'),
+                    '--input', os.path.dirname(pdf_path), '--output', tmp], check=True, capture_output=True)
+    return time.perf_counter() - t0
+
+
+def in_process_request(client, pdf_bytes):
+    # Submit, then long-poll the job until it finishes
+    t0 = time.perf_counter()
+    resp = client.post('/upload', data={'file': (io.BytesIO(pdf_bytes), 'bench.pdf')})
+    assert resp.status_code == 202, resp.json
+    job = resp.json
+    while job['status'] in ('queued', 'running'):
+        job = client.get(f"/jobs/{job['job_id']}?wait=10").json
+    assert job['status'] == 'done', job
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # the app creates uploads/ and output/ relative to the working directory
+        import app as frontend
+        frontend.app.config['CACHE_FOLDER'] = None
+        client = frontend.app.test_client()
+        pdfs = []
+        for seed in range(args.requests + 1):
+            pdf_path = make_pdf(os.path.join(tmp, f'in{seed}', 'bench.pdf'), pages=30, seed=seed)
+            with open(pdf_path, 'rb') as f:
+                pdfs.append((pdf_path, f.read()))
+        before = [subprocess_request(path, tmp) for path, _ in pdfs[1:]]
+        cold = in_process_request(client, pdfs[0][1])
+        warm = [in_process_request(client, data) for _, data in pdfs[1:]]
+        print(f"subprocess per request: median {statistics.median(before):.3f}s")
+        print(f"warm pool, first call:  {cold:.3f}s (spawns workers)")
+        print(f"warm pool:              median {statistics.median(warm):.3f}s "
+              f"({statistics.median(before) / statistics.median(warm):.1f}x)")
+        frontend.get_extract_pool().shutdown()
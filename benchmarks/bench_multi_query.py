@@ -0,0 +1,55 @@
+"""Many personas over one corpus: a full process_persona run per query (before) vs one process_queries run.
+
+Usage: python benchmarks/bench_multi_query.py [--queries 24] [--docs 50] [--sections 100] [--model-dir path]
+"""
+import os
+import sys
+import time
+import json
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1b_persona_intelligence as r1b
+from synthetic import make_outline, WORDS
+from bench_embedding_batching import CountingModel
+
+
+def make_queries(n):
+    return [(f'{WORDS[i % len(WORDS)].capitalize()} analyst {i}', f'Review {WORDS[(3 * i) % len(WORDS)]} and {WORDS[(7 * i) % len(WORDS)]}')
+            for i in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=24)
+    parser.add_argument('--docs', type=int, default=50)
+    parser.add_argument('--sections', type=int, default=100)
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    args = parser.parse_args()
+    model = r1b.load_model(args.model_dir)
+    queries = make_queries(args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        in_dir = os.path.join(tmp, 'in')
+        os.makedirs(in_dir)
+        for i in range(args.docs):
+            with open(os.path.join(in_dir, f'doc{i}.json'), 'w', encoding='utf-8') as f:
+                json.dump(make_outline(args.sections, seed=i), f)
+
+        def one_run_per_query(m):
+            # What serving N personas meant before: the whole pipeline once per persona
+            for i, (persona, job) in enumerate(queries):
+                out_dir = os.path.join(tmp, 'before', str(i))
+                os.makedirs(out_dir, exist_ok=True)
+                r1b.process_persona(in_dir, out_dir, persona, job, model=m)
+
+        def one_run(m):
+            r1b.process_queries(in_dir, os.path.join(tmp, 'after'), queries, model=m)
+
+        for name, run in (('process_persona per query', one_run_per_query), ('process_queries', one_run)):
+            counting = CountingModel(model)
+            t0 = time.perf_counter()
+            run(counting)
+            elapsed = time.perf_counter() - t0
+            print(f"{name:26s} {elapsed:7.2f}s  {elapsed / len(queries) * 1000:8.1f}ms/query  "
+                  f"{counting.calls:5d} encode calls  {counting.texts:7d} texts encoded")
@@ -0,0 +1,74 @@
+"""Microbenchmark: per-span detect_language loop (before) vs span_scripts over the document text buffer.
+
+Usage: python benchmarks/bench_scripts.py [--spans 200000] [--scripts LATIN CJK ARABIC ...]
+Spans are single-script, so the old function and the batch codes must agree wherever the old one knew
+the script; scripts it did not know (Thai, Cyrillic, Hangul, Greek) came out as LATIN before.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1a_structure_extractor as r1a
+from synthetic import WORDS
+
+LEGACY_SCRIPTS = ('LATIN', 'CJK', 'DEVANAGARI', 'ARABIC', 'HEBREW')
+
+
+def legacy_detect_language(text):
+    # The previous implementation, verbatim
+    for ch in text:
+        code = ord(ch)
+        if 0x3040 <= code <= 0x30ff or 0x4e00 <= code <= 0x9fff:
+            return 'CJK'
+        if 0x0900 <= code <= 0x097F:
+            return 'DEVANAGARI'
+        if 0x0600 <= code <= 0x06FF:
+            return 'ARABIC'
+        if 0x0590 <= code <= 0x05FF:
+            return 'HEBREW'
+    return 'LATIN'
+
+
+def make_spans(n, scripts, seed=0):
+    # Latin spans reuse the synthetic vocabulary; other scripts draw from the first block of their range.
+    # Numbers and punctuation come first, so the per-character loop walks a few characters before a hit.
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        script = scripts[i % len(scripts)]
+        if script == 'LATIN':
+            words = [rng.choice(WORDS) for _ in range(rng.randint(2, 12))]
+        else:
+            lo, hi = r1a.SCRIPT_RANGES[script][0]
+            words = [''.join(chr(rng.randint(lo, hi)) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(2, 8))]
+        texts.append(f'{rng.randint(1, 99)}. ' + ' '.join(words))
+    return texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spans', type=int, default=200_000)
+    parser.add_argument('--scripts', nargs='+', default=list(r1a.SCRIPT_NAMES), choices=r1a.SCRIPT_NAMES)
+    args = parser.parse_args()
+    texts = make_spans(args.spans, args.scripts)
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    buffer = ''.join(texts)
+
+    t0 = time.perf_counter()
+    old = [legacy_detect_language(t) for t in texts]
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    codes = r1a.span_scripts(buffer, offsets)
+    t_new = time.perf_counter() - t0
+    new = [r1a.SCRIPT_NAMES[c] for c in codes.tolist()]
+    agree = sum(o == (n if n in LEGACY_SCRIPTS else 'LATIN') for o, n in zip(old, new)) / len(texts)
+    counts = {name: int(np.sum(codes == i)) for i, name in enumerate(r1a.SCRIPT_NAMES) if np.any(codes == i)}
+    print(f"spans={len(texts)} chars={len(buffer)} scripts={counts}")
+    print(f"per-span loop: {t_old:.3f}s  ({len(texts) / t_old:,.0f} spans/s)")
+    print(f"span_scripts:  {t_new:.3f}s  ({len(texts) / t_new:,.0f} spans/s, {t_old / t_new:.1f}x)  "
+          f"agreement on previously known scripts {agree:.1%}")
@@ -0,0 +1,79 @@
+"""Corpus-wide top-k sections: per-document cosine_similarity + full sorts (before) vs SectionIndex exact and IVF.
+
+Usage: python benchmarks/bench_section_index.py [--sizes 10000 100000 1000000] [--dim 384] [--queries 20]
+Vectors are synthetic topic clusters (like sentence embeddings of related headings), built in
+100-section documents; recall@k is measured against the exact search.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from section_index import SectionIndex, IVF_NPROBE
+
+SECTIONS_PER_DOC = 100
+TOPICS = 2000
+
+
+def synthetic_corpus(n, dim, seed=0):
+    # Yields (doc name, sections, vectors) for n sections around TOPICS random topic directions
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((TOPICS, dim)).astype(np.float32)
+    for doc, start in enumerate(range(0, n, SECTIONS_PER_DOC)):
+        m = min(SECTIONS_PER_DOC, n - start)
+        vectors = topics[rng.integers(0, TOPICS, m)] + 0.6 * rng.standard_normal((m, dim)).astype(np.float32)
+        sections = [{'level': 'H1', 'text': f'section {start + i}', 'page': i // 5 + 1} for i in range(m)]
+        yield f'doc{doc}.json', sections, vectors
+    return topics
+
+
+def per_document_top_k(index, query, k):
+    # What Round 1B could do before: cosine_similarity per document, sorted(), then merge and sort again
+    ranked = []
+    for start in range(0, index.n, SECTIONS_PER_DOC):
+        sims = cosine_similarity([query], index.vectors[start:start + SECTIONS_PER_DOC])[0]
+        ranked.extend(sorted(zip(range(start, start + len(sims)), sims), key=lambda x: -x[1]))
+    return sorted(ranked, key=lambda x: -x[1])[:k]
+
+
+def timed(fn, queries):
+    t0 = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - t0) / len(queries) * 1000, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=IVF_NPROBE)
+    parser.add_argument('--skip-before', type=int, default=100000, help='Skip the per-document baseline above this size')
+    args = parser.parse_args()
+    rng = np.random.default_rng(1)
+    for n in args.sizes:
+        index = SectionIndex()
+        t0 = time.perf_counter()
+        for name, sections, vectors in synthetic_corpus(n, args.dim):
+            index.add(name, sections, vectors)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.train()
+        train = time.perf_counter() - t0
+        # Unit-norm rows, so the noise is scaled to keep each query close to its source section
+        queries = index.vectors[rng.integers(0, n, args.queries)] + (0.5 / np.sqrt(args.dim)) * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        exact_ms, exact = timed(lambda q: index.search(q, args.k, mode='exact'), queries)
+        ivf_ms, ivf = timed(lambda q: index.search(q, args.k, mode='ivf', nprobe=args.nprobe), queries)
+        recall = np.mean([len({id(s) for _, s in a} & {id(s) for _, s in b}) / args.k for a, b in zip(exact, ivf)])
+        batch_ms = timed(lambda qs: index.search(qs, args.k, mode='exact'), [queries])[0] / args.queries
+        line = (f"n={n:>8d}  add {build:6.2f}s  train {train:6.2f}s ({len(index.centroids)} lists)  "
+                f"exact {exact_ms:8.2f}ms/q  exact batched {batch_ms:7.2f}ms/q  ivf {ivf_ms:6.2f}ms/q  recall@{args.k} {recall:.3f}")
+        if n <= args.skip_before:
+            before_ms, _ = timed(lambda q: per_document_top_k(index, q, args.k), queries[:3])
+            line += f"  per-document sorts {before_ms:8.1f}ms/q"
+        print(line, flush=True)
+        del index
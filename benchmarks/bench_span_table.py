@@ -0,0 +1,61 @@
+"""Before/after wall time for layout parsing: legacy double get_text('dict') vs SpanTable.
+
+Usage: python benchmarks/bench_span_table.py [--pages 500] [--repeat 3] [--pdf path]
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1a_structure_extractor as r1a
+from synthetic import make_pdf
+
+
+def legacy_parse(doc):
+    # What process_pdf did before: one pass for KMeans features, one for headings, page 0 for the title
+    n = 0
+    for _ in range(2):
+        for page in doc:
+            for b in page.get_text('dict')['blocks']:
+                if b['type'] != 0:
+                    continue
+                for line in b['lines']:
+                    for span in line['spans']:
+                        n += 1
+    doc[0].get_text('dict')
+    return n
+
+
+def span_table_parse(doc):
+    return len(r1a.build_span_table(doc))
+
+
+def best_of(fn, doc, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(doc)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=500, help='Pages in the synthetic PDF')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--pdf', help='Benchmark an existing PDF instead of a synthetic one')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or make_pdf(os.path.join(tmp, 'bench.pdf'), pages=args.pages)
+        doc = fitz.open(pdf_path)
+        before = best_of(legacy_parse, doc, args.repeat)
+        after = best_of(span_table_parse, doc, args.repeat)
+        print(f"pages={len(doc)} spans={span_table_parse(doc)}")
+        print(f"legacy parse:     {before:.3f}s")
+        print(f"span table parse: {after:.3f}s  ({before / after:.2f}x)")
+        t0 = time.perf_counter()
+        r1a.process_pdf(pdf_path)
+        print(f"process_pdf total: {time.perf_counter() - t0:.3f}s")
@@ -0,0 +1,76 @@
+"""Cold-start cost of the entry points, measured with `python -X importtime` in fresh processes.
+
+Usage: python benchmarks/bench_startup.py [--repeat 3]
+Reports each module's cumulative import time (median), the heaviest packages it pulls in, what the
+imports the modules used to do eagerly (sklearn, scipy.sparse) would add on top, and the wall time
+of a `cli.py extract` run on a small PDF served from a warm outline cache (no clustering needed).
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+from synthetic import make_pdf
+
+TARGETS = ['round1a_structure_extractor', 'round1b_persona_intelligence', 'cli']
+PREVIOUSLY_EAGER = ['sklearn.cluster', 'sklearn.metrics.pairwise', 'sklearn.feature_extraction.text', 'scipy.sparse']
+HEAVY = ('sklearn', 'scipy', 'torch', 'sentence_transformers', 'transformers')
+LINE = re.compile(r'import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)')
+
+
+def importtime(statement):
+    # {module: cumulative seconds} for one fresh interpreter
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    modules = {}
+    for m in LINE.finditer(out):
+        modules[m.group(2)] = int(m.group(1)) / 1e6
+    return modules
+
+
+def median_import(statement, name, repeat):
+    runs = [importtime(statement) for _ in range(repeat)]
+    return statistics.median(r[name] for r in runs), runs[-1]
+
+
+def cached_extract_seconds(repeat):
+    tmp = tempfile.mkdtemp(prefix='bench-startup-')
+    try:
+        os.makedirs(os.path.join(tmp, 'in'))
+        make_pdf(os.path.join(tmp, 'in', 'small.pdf'), pages=3)
+        cmd = [sys.executable, os.path.join(ROOT, 'cli.py'), 'extract', '--input', os.path.join(tmp, 'in'),
+               '--output', os.path.join(tmp, 'out'), '--cache-dir', os.path.join(tmp, 'cache')]
+        subprocess.run(cmd, capture_output=True, check=True)  # fills the cache
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, capture_output=True, check=True)
+            times.append(time.perf_counter() - t0)
+        return statistics.median(times)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for target in TARGETS:
+        total, modules = median_import(f'import {target}', target, args.repeat)
+        top = sorted(((sec, name) for name, sec in modules.items() if '.' not in name and name != target), reverse=True)[:4]
+        heavy = sorted({name.split('.')[0] for name in modules if name.split('.')[0] in HEAVY})
+        print(f"{target:30s} {total * 1000:7.1f}ms  heaviest: "
+              + ', '.join(f'{name} {sec * 1000:.0f}ms' for sec, name in top)
+              + f"  heavy packages: {', '.join(heavy) or 'none'}")
+    statement = '; '.join(f'import {m}' for m in PREVIOUSLY_EAGER)
+    runs = [importtime(statement) for _ in range(args.repeat)]
+    eager = statistics.median(sum(r[m] for m in PREVIOUSLY_EAGER if m in r) for r in runs)
+    print(f"{'previously eager imports':30s} {eager * 1000:7.1f}ms  ({', '.join(PREVIOUSLY_EAGER)})")
+    print(f"{'cli.py extract, cached PDF':30s} {cached_extract_seconds(args.repeat) * 1000:7.1f}ms  wall, fresh process")
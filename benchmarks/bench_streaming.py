@@ -0,0 +1,59 @@
+"""Time to first heading and peak traced memory: batch process_pdf vs streaming iter_outline.
+
+Usage: python benchmarks/bench_streaming.py [--pages 1000] [--stats-pages 20] [--pdf path]
+Sharding and the cache are off so every mode parses the whole document in this process.
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1a_structure_extractor as r1a
+from synthetic import make_pdf
+
+
+def batch(pdf_path, stats_pages):
+    # The whole outline exists only once process_pdf returns
+    result = r1a.process_pdf(pdf_path, shard_threshold=0)
+    for heading in result['outline']:
+        yield heading
+
+
+def stream(pdf_path, stats_pages):
+    for record in r1a.iter_outline(pdf_path, shard_threshold=0, stats_pages=stats_pages):
+        if record['type'] == 'heading':
+            yield record
+
+
+def measure(fn, pdf_path, stats_pages=None):
+    r1a._center_cache.clear()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    first, count = None, 0
+    for _ in fn(pdf_path, stats_pages):
+        if first is None:
+            first = time.perf_counter() - t0
+        count += 1
+    total = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, total, peak / (1024 * 1024), count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--stats-pages', type=int, default=20)
+    parser.add_argument('--pdf', help='PDF to stream (default: synthetic)')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or make_pdf(os.path.join(tmp, 'bench.pdf'), pages=args.pages)
+        runs = [('process_pdf (batch)', batch, None),
+                ('iter_outline (exact)', stream, None),
+                (f'iter_outline (stats_pages={args.stats_pages})', stream, args.stats_pages)]
+        for name, fn, stats_pages in runs:
+            first, total, peak_mb, count = measure(fn, pdf_path, stats_pages)
+            print(f"{name:32s} first heading {first:7.3f}s  total {total:7.3f}s  peak {peak_mb:7.1f}MB  headings {count}")
@@ -0,0 +1,70 @@
+"""TextRank summaries on long sections: per-section TF-IDF + dense networkx PageRank (before) vs the sparse
+NumPy power iteration on the TF-IDF fallback, on precomputed sentence embeddings, and memoized repeats.
+
+Usage: python benchmarks/bench_textrank.py [--sentences 100 300 1000] [--sections 5] [--model-dir path]
+Embedding time is reported separately: analyze_subsections has already paid it for the highlights.
+Agreement is the share of top-2 sentences the TF-IDF fallback shares with the networkx version.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import round1b_persona_intelligence as r1b
+from synthetic import WORDS
+
+
+def legacy_textrank(text, top_n=2):
+    # The previous implementation, verbatim
+    import networkx as nx
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    sentences = [s.strip() for s in re.split(r'[\n\.!?]', text) if len(s.strip()) > 10]
+    if len(sentences) <= top_n:
+        return sentences
+    tfidf = TfidfVectorizer().fit_transform(sentences)
+    sim_matrix = cosine_similarity(tfidf)
+    nx_graph = nx.from_numpy_array(sim_matrix)
+    scores = nx.pagerank(nx_graph)
+    ranked = sorted(((scores[i], s) for i, s in enumerate(sentences)), reverse=True)
+    return [s for _, s in ranked[:top_n]]
+
+
+def make_section(n_sentences, seed):
+    rng = random.Random(seed)
+    return ' '.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + '.'
+                    for _ in range(n_sentences))
+
+
+def timed(fn, texts):
+    t0 = time.perf_counter()
+    out = [fn(t) for t in texts]
+    return time.perf_counter() - t0, out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sentences', type=int, nargs='+', default=[100, 300, 1000])
+    parser.add_argument('--sections', type=int, default=5, help='sections per size')
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    args = parser.parse_args()
+    model = r1b.load_model(args.model_dir)
+    for n in args.sentences:
+        texts = [make_section(n, seed=n * 100 + i) for i in range(args.sections)]
+        t0 = time.perf_counter()
+        vecs = {t: r1b.embed_text(model, r1b.split_paragraphs(t), batch_size=64) for t in texts}
+        embed_sec = time.perf_counter() - t0
+        legacy_sec, legacy = timed(legacy_textrank, texts)
+        r1b._summaries.clear()
+        tfidf_sec, tfidf = timed(r1b.textrank_summarize, texts)
+        r1b._summaries.clear()
+        embed_rank_sec, _ = timed(lambda t: r1b.textrank_summarize(t, para_vecs=vecs[t]), texts)
+        memo_sec, _ = timed(lambda t: r1b.textrank_summarize(t, para_vecs=vecs[t]), texts)
+        agree = sum(len(set(a) & set(b)) for a, b in zip(legacy, tfidf)) / max(1, sum(len(a) for a in legacy))
+        per = lambda sec: sec / len(texts) * 1000
+        print(f"{n:5d} sentences  networkx {per(legacy_sec):8.1f}ms  tfidf+numpy {per(tfidf_sec):7.1f}ms  "
+              f"embeddings+numpy {per(embed_rank_sec):7.1f}ms  memoized {per(memo_sec):6.3f}ms  "
+              f"(embedding {per(embed_sec):7.1f}ms, already paid)  top-2 agreement {agree:.0%}")
@@ -0,0 +1,72 @@
+"""Load test for the upload job API: N concurrent clients each submit a distinct PDF and poll to completion.
+
+Usage: python benchmarks/loadtest_jobs.py [--clients 16] [--uploads 4] [--pages 20]
+Reports jobs/sec, end-to-end latency percentiles and how many submissions were shed with 503.
+The cache is disabled so every job really extracts.
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'frontend'))
+from synthetic import make_pdf
+
+
+def run_client(client, pdfs, latencies, rejected, lock):
+    for name, data in pdfs:
+        t0 = time.perf_counter()
+        while True:
+            resp = client.post('/upload', data={'file': (io.BytesIO(data), name)})
+            if resp.status_code != 503:
+                break
+            with lock:
+                rejected.append(name)
+            time.sleep(float(resp.headers.get('Retry-After', 1)))
+        job = resp.json
+        while job['status'] in ('queued', 'running'):
+            job = client.get(f"/jobs/{job['job_id']}?wait=10").json
+        with lock:
+            latencies.append((time.perf_counter() - t0, job['status']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--uploads', type=int, default=4, help='uploads per client')
+    parser.add_argument('--pages', type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # the app creates uploads/ and output/ relative to the working directory
+        import app as frontend
+        frontend.app.config['CACHE_FOLDER'] = None
+        total = args.clients * args.uploads
+        pdfs = []
+        for seed in range(total):
+            path = make_pdf(os.path.join(tmp, 'in', f'load{seed}.pdf'), pages=args.pages, seed=seed)
+            with open(path, 'rb') as f:
+                pdfs.append((os.path.basename(path), f.read()))
+        # Warm the extraction pool so worker spawn time is not counted
+        run_client(frontend.app.test_client(), [pdfs[0]], [], [], threading.Lock())
+        latencies, rejected, lock = [], [], threading.Lock()
+        threads = [threading.Thread(target=run_client, args=(frontend.app.test_client(), pdfs[i::args.clients], latencies, rejected, lock))
+                   for i in range(args.clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        secs = np.array([s for s, _ in latencies])
+        failed = sum(1 for _, status in latencies if status != 'done')
+        p50, p95, p99 = np.percentile(secs, [50, 95, 99])
+        print(f"{total} jobs from {args.clients} clients in {elapsed:.2f}s: {total / elapsed:.2f} jobs/sec, "
+              f"{failed} failed, {len(rejected)} submissions shed with 503")
+        print(f"end-to-end latency p50 {p50:.3f}s  p95 {p95:.3f}s  p99 {p99:.3f}s")
+        print(f"scheduler: {frontend.get_scheduler().stats()}")
+        frontend.get_extract_pool().shutdown()
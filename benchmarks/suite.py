@@ -0,0 +1,298 @@
+"""Benchmark suite with regression gates: Round 1A and Round 1B stage timings, throughput and peak RSS on a
+synthetic PDF corpus whose cases vary page count, spans per page, TOC size and script.
+
+Usage: python benchmarks/suite.py [--quick] [--repeat 3] [--out bench_results.json]
+                                  [--baseline benchmarks/baseline.json] [--update-baseline] [--tolerance 0.3]
+                                  [--model-dir path] [--backend torch|onnx|onnx-int8] [--skip-1b]
+Every case runs in a fresh interpreter, so its peak RSS (ru_maxrss) is its own; stage times are the median
+of --repeat runs after an untimed warm-up. Round 1A stages are those extract_to_file's Metrics records: parse,
+cluster, toc, title, classify, serialize. Round 1B runs over the Round 1A outputs (with section text) of every
+case: model_load, load, embed, rank, summarize. The run fails (exit 1) when a case crashes or writes an outline
+that differs from process_pdf, a baseline entry goes unmeasured, or a stage or peak RSS exceeds the baseline
+by more than --tolerance and by more than MIN_REGRESSION_SEC / MIN_REGRESSION_MB, so millisecond noise never
+trips it. Baselines are machine-specific: regenerate them with --update-baseline on the machine that runs the
+gate.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, ROOT_DIR)
+from synthetic import make_pdf
+
+# --- Suite config ---
+CASES = [
+    {'name': 'short', 'pages': 20, 'spans_per_page': 40},
+    {'name': 'long', 'pages': 400, 'spans_per_page': 40},
+    {'name': 'sparse', 'pages': 200, 'spans_per_page': 10},
+    {'name': 'big-toc', 'pages': 100, 'spans_per_page': 40, 'toc_size': 2000},
+    {'name': 'cjk', 'pages': 100, 'spans_per_page': 40, 'script': 'cjk'},
+    {'name': 'mixed', 'pages': 100, 'spans_per_page': 40, 'script': 'mixed'},
+]
+QUICK_PAGE_DIVISOR = 10  # --quick shrinks every case this much
+QUERIES = [
+    ('Climate policy analyst', 'Summarize carbon market mechanisms'),
+    ('Urban planner', 'Find transport and grid storage risks'),
+    ('Ocean scientist', 'Review temperature and water impact data'),
+    ('Energy investor', 'Compare renewable growth and emissions'),
+]
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.3  # allowed slowdown / RSS growth over the baseline
+MIN_REGRESSION_SEC = 0.1
+MIN_REGRESSION_MB = 20
+
+
+def peak_rss_mb():
+    # Kernel-tracked high-water mark of this process (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def median_stages(runs):
+    return {stage: round(statistics.median(run[stage] for run in runs), 4) for stage in runs[0]}
+
+
+# --- Children: one fresh interpreter per measurement ---
+def child_round1a(args):
+    import round1a_structure_extractor as r1a
+    r1a.CENTER_CACHE_SIZE = 0  # every run fits its font clusters, like a document seen for the first time
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, 'out.json')
+        # Untimed warm-up: lazy imports (sklearn) and the OS page cache would otherwise land in the first run
+        r1a.extract_to_file(args.pdf, out_path, shard_threshold=0)
+        runs = []
+        for _ in range(args.repeat):
+            _, error, _, _, run = r1a.extract_to_file(args.pdf, out_path, shard_threshold=0)
+            if error:
+                raise RuntimeError(error)
+            # Stage times as extract_to_file's Metrics records them (no cache, no sharding)
+            runs.append({stage: entry['seconds'] for stage, entry in run['stages'].items()})
+        with open(out_path, encoding='utf-8') as f:
+            outline = json.load(f)['outline']
+    stages = median_stages(runs)
+    total = sum(stages.values())
+    expected = r1a.process_pdf(args.pdf, shard_threshold=0)['outline']
+    pages, num_spans = run['counters']['pages'], run['counters']['spans']
+    return {
+        'stages': stages,
+        'total_sec': round(total, 4),
+        'pages': pages,
+        'spans': num_spans,
+        'headings': len(outline),
+        'pages_per_sec': round(pages / total, 1) if total > 0 else None,
+        'spans_per_sec': round(num_spans / total) if total > 0 else None,
+        'matches_process_pdf': outline == expected,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+class TimedModel:
+    # Wraps the encoder to time encode calls and count texts
+    def __init__(self, model):
+        self.model = model
+        self.seconds = 0.0
+        self.texts = 0
+
+    def encode(self, texts, **kwargs):
+        t = time.perf_counter()
+        out = self.model.encode(texts, **kwargs)
+        self.seconds += time.perf_counter() - t
+        self.texts += len(texts)
+        return out
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+
+def child_round1b(args):
+    import round1b_persona_intelligence as r1b
+    t = time.perf_counter()
+    model = r1b.load_model(args.model_dir, backend=args.backend)
+    model_load = time.perf_counter() - t
+    analyze = r1b.analyze_subsections
+    summarize_sec = [0.0]
+
+    def timed_analyze(*a, **kw):
+        t = time.perf_counter()
+        try:
+            return analyze(*a, **kw)
+        finally:
+            summarize_sec[0] += time.perf_counter() - t
+    r1b.analyze_subsections = timed_analyze
+    runs = []
+    for _ in range(args.repeat):
+        r1b._summaries.clear()
+        summarize_sec[0] = 0.0
+        timed = TimedModel(model)
+        t = time.perf_counter()
+        docs = r1b.load_outlines(args.input)
+        bodies = [r1b.open_section_text(args.input, doc) for _, doc in docs]
+        load = time.perf_counter() - t
+        t = time.perf_counter()
+        r1b.rank_queries(docs, QUERIES, timed, bodies=bodies)
+        wall = time.perf_counter() - t
+        runs.append({'load': load, 'embed': timed.seconds, 'rank': wall - timed.seconds - summarize_sec[0],
+                     'summarize': summarize_sec[0]})
+    stages = median_stages(runs)
+    stages['model_load'] = round(model_load, 4)
+    sections = sum(len(doc.get('outline', [])) for _, doc in docs)
+    total = sum(v for k, v in stages.items() if k != 'model_load')
+    return {
+        'stages': stages,
+        'total_sec': round(total, 4),
+        'documents': len(docs),
+        'sections': sections,
+        'queries': len(QUERIES),
+        'texts_encoded': timed.texts,
+        'sections_per_sec': round(sections * len(QUERIES) / total) if total > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_child(kind, extra, repeat):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', kind, '--repeat', str(repeat)] + extra
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'exit {proc.returncode}'
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+
+# --- Gate ---
+def gated_entries(results):
+    for case, entry in results.get('round1a', {}).items():
+        yield f'round1a/{case}', entry
+    if results.get('round1b'):
+        yield 'round1b/corpus', results['round1b']
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns one message per stage or peak RSS that regressed past the baseline, and per baseline entry
+    this run did not measure."""
+    current = dict(gated_entries(results))
+    regressions = []
+    for name, base in gated_entries(baseline):
+        now = current.get(name)
+        if now is None:
+            if not (name.startswith('round1b/') and results['meta'].get('skip_1b')):
+                regressions.append(f"{name} is in the baseline but was not measured")
+            continue
+        for stage, base_sec in base['stages'].items():
+            sec = now['stages'].get(stage)
+            if sec is not None and sec > base_sec * (1 + tolerance) and sec - base_sec > MIN_REGRESSION_SEC:
+                regressions.append(f"{name} {stage} regressed: {sec:.3f}s vs baseline {base_sec:.3f}s (+{sec / base_sec - 1:.0%})")
+        base_mb, mb = base['peak_rss_mb'], now['peak_rss_mb']
+        if mb > base_mb * (1 + tolerance) and mb - base_mb > MIN_REGRESSION_MB:
+            regressions.append(f"{name} peak RSS regressed: {mb:.1f}MB vs baseline {base_mb:.1f}MB (+{mb / base_mb - 1:.0%})")
+    return regressions
+
+
+def run_suite(args):
+    import fitz
+    import numpy as np
+    import round1a_structure_extractor as r1a
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+            'numpy': np.__version__,
+            'quick': args.quick,
+            'repeat': args.repeat,
+            'skip_1b': args.skip_1b,
+        },
+        'round1a': {},
+        'failures': [],  # cases whose child process failed; any of them fails the run
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        outlines = os.path.join(tmp, 'outlines')
+        os.makedirs(outlines)
+        for case in CASES:
+            params = {k: v for k, v in case.items() if k != 'name'}
+            if args.quick:
+                params['pages'] = max(5, params['pages'] // QUICK_PAGE_DIVISOR)
+            pdf_path = make_pdf(os.path.join(tmp, f"{case['name']}.pdf"), **params)
+            entry, error = run_child('1a', ['--pdf', pdf_path], args.repeat)
+            if error:
+                print(f"[ERROR] round1a/{case['name']}: {error}")
+                results['failures'].append(f"round1a/{case['name']}: {error}")
+                continue
+            entry['case'] = params
+            results['round1a'][case['name']] = entry
+            s = entry['stages']
+            print(f"[INFO] round1a/{case['name']:8s} {entry['pages']:4d} pages {entry['spans']:6d} spans  "
+                  + '  '.join(f'{k} {v:.3f}s' for k, v in s.items())
+                  + f"  {entry['pages_per_sec']} pages/s  peak {entry['peak_rss_mb']}MB")
+            if not entry['matches_process_pdf']:
+                print(f"[ERROR] round1a/{case['name']}: written outline differs from process_pdf")
+                results['failures'].append(f"round1a/{case['name']}: written outline differs from process_pdf")
+            # Round 1B input: the same document as Round 1A writes it, with section bodies
+            r1a.extract_to_file(pdf_path, os.path.join(outlines, f"{case['name']}.json"), shard_threshold=0,
+                                section_text=True)
+        if not args.skip_1b:
+            extra = ['--input', outlines, '--backend', args.backend] + (['--model-dir', args.model_dir] if args.model_dir else [])
+            entry, error = run_child('1b', extra, args.repeat)
+            if error:
+                print(f"[ERROR] round1b/corpus: {error}")
+                results['failures'].append(f"round1b/corpus: {error}")
+            else:
+                results['round1b'] = entry
+                print(f"[INFO] round1b/corpus   {entry['sections']} sections x {entry['queries']} queries  "
+                      + '  '.join(f'{k} {v:.3f}s' for k, v in entry['stages'].items())
+                      + f"  {entry['sections_per_sec']} sections/s  peak {entry['peak_rss_mb']}MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quick', action='store_true', help=f'Shrink every case {QUICK_PAGE_DIVISOR}x (smoke run)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the median is kept')
+    parser.add_argument('--out', default='bench_results.json', help='Results JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results to gate against')
+    parser.add_argument('--update-baseline', action='store_true', help='Write these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    parser.add_argument('--backend', default='torch', help='Round 1B embedding backend')
+    parser.add_argument('--skip-1b', action='store_true', help='Only benchmark Round 1A')
+    parser.add_argument('--child', choices=['1a', '1b'], help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child_round1a(args) if args.child == '1a' else child_round1b(args)))
+        raise SystemExit(0)
+    results = run_suite(args)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results written to {args.out}")
+    if results['failures']:
+        print(f"[ERROR] {len(results['failures'])} benchmark case(s) failed; baseline not compared or updated")
+        raise SystemExit(1)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('quick') != args.quick:
+            print("[WARN] Baseline and this run differ in --quick; not comparing")
+        else:
+            regressions = compare(results, baseline, args.tolerance)
+            for message in regressions:
+                print(f"[ERROR] {message}")
+            if regressions:
+                raise SystemExit(1)
+            print(f"[INFO] No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"[WARN] No baseline at {args.baseline}; run with --update-baseline to create one")
@@ -0,0 +1,82 @@
+import os
+import random
+import fitz  # PyMuPDF
+
+# --- Synthetic corpus config ---
+BODY_FONT = 'helv'
+HEADING_FONT = 'hebo'  # Helvetica-Bold
+BODY_SIZE = 10
+H1_SIZE = 18
+H2_SIZE = 14
+LINE_HEIGHT = 14
+WORDS = ('energy climate policy adaptation carbon market emissions renewable '
+         'analysis model data section results method review impact water soil '
+         'forest ocean temperature growth risk urban transport storage grid').split()
+CJK_FONT = 'china-s'  # built-in Droid Sans Fallback; has no bold face, so CJK headings differ by size only
+CJK_WORDS = ('気候 政策 分析 炭素 市場 排出 再生 エネルギー データ 結果 方法 影響 '
+             '水 森林 海洋 温度 成長 リスク 都市 交通 貯蔵 電力網').split()
+SCRIPTS = ('latin', 'cjk', 'mixed')  # mixed alternates latin and cjk pages
+
+
+def _sentence(rng, n_words=9):
+    return ' '.join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + '.'
+
+
+def _cjk_sentence(rng, n_words=9):
+    return ''.join(rng.choice(CJK_WORDS) for _ in range(n_words)) + '。'
+
+
+def make_pdf(path, pages=300, spans_per_page=40, toc_size=None, seed=0, script='latin'):
+    # Builds a deterministic multi-page PDF with H1/H2 headings, body text and an outline
+    if script not in SCRIPTS:
+        raise ValueError(f'Unknown script: {script}')
+    rng = random.Random(seed)
+    doc = fitz.open()
+    doc.set_metadata({'title': ''})
+    toc = []
+    section = 0
+    for p in range(pages):
+        page = doc.new_page()
+        cjk = script == 'cjk' or (script == 'mixed' and p % 2 == 1)
+        heading_font, body_font = (CJK_FONT, CJK_FONT) if cjk else (HEADING_FONT, BODY_FONT)
+        word = (lambda: rng.choice(CJK_WORDS)) if cjk else (lambda: rng.choice(WORDS).capitalize())
+        y = 60
+        for i in range(spans_per_page):
+            if y > page.rect.height - 60:
+                break
+            if i == 0:
+                section += 1
+                text = f'{section}. {word()} {rng.choice(CJK_WORDS if cjk else WORDS)}'
+                y += LINE_HEIGHT
+                page.insert_text((36, y), text, fontname=heading_font, fontsize=H1_SIZE)
+                y += H1_SIZE + LINE_HEIGHT
+                toc.append([1, text, p + 1])
+            elif i % 12 == 0:
+                text = f'{section}.{i // 12} {word()} {rng.choice(CJK_WORDS if cjk else WORDS)}'
+                y += LINE_HEIGHT
+                page.insert_text((36, y), text, fontname=heading_font, fontsize=H2_SIZE)
+                y += H2_SIZE + 4
+                toc.append([2, text, p + 1])
+            else:
+                sentence = _cjk_sentence(rng) if cjk else _sentence(rng)
+                page.insert_text((rng.choice((72, 90, 108)), y), sentence, fontname=body_font, fontsize=BODY_SIZE)
+                y += LINE_HEIGHT
+    if toc_size is not None:
+        while len(toc) < toc_size:
+            toc.append([2, f'Appendix entry {len(toc)}', pages])
+        toc = toc[:toc_size]
+    doc.set_toc(toc)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_outline(sections=200, seed=0):
+    # Round 1A-style outline JSON with short heading texts, some repeated across documents
+    rng = random.Random(seed)
+    outline = []
+    for i in range(sections):
+        text = f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.choice(WORDS)}. {_sentence(rng, 6)}'
+        outline.append({'level': rng.choice(('H1', 'H2', 'H3')), 'text': text, 'page': i // 5 + 1})
+    return {'title': f'Synthetic document {seed}', 'outline': outline}
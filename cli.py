@@ -0,0 +1,126 @@
+"""Single entry point for both rounds.
+
+    python cli.py extract  [Round 1A options]  PDFs -> outline JSONs (as round1a_structure_extractor.py)
+    python cli.py rank     [Round 1B options]  outline JSONs -> persona outputs (as round1b_persona_intelligence.py)
+    python cli.py pipeline [options]           PDFs -> persona outputs in one process
+    python cli.py watch    [options]           keep extracting (and ranking) PDFs as they arrive
+
+pipeline hands each Round 1A outline to Round 1B in memory instead of writing and re-parsing JSON.
+Heavy libraries (sklearn, scipy, torch) are imported by the code paths that use them, so parsing
+arguments and cache hits stay cheap; check with `python -X importtime cli.py --help`.
+"""
+import os
+import json
+import argparse
+import tempfile
+import round1a_structure_extractor as round1a
+import round1b_persona_intelligence as round1b
+from instrumentation import Metrics
+from watcher import Watcher, WATCH_INTERVAL, WATCH_SETTLE_SEC, STATE_DIR
+
+
+def extract_outlines(input_dir, section_dir, outlines_dir=None, shard_threshold=round1a.SHARD_PAGE_THRESHOLD,
+                     shard_workers=None, cache=None, metrics=None):
+    """
+    Round 1A over every PDF in input_dir, in this process. Section bodies go to sidecars in section_dir
+    (memory-mapped by round1b.SectionText); outlines stay in memory and are also written to outlines_dir
+    if given. A PDF that fails is reported and skipped. Returns (docs, bodies, signatures, failures):
+    the first three as round1b.process_queries takes them, with the PDFs' file stats as index signatures.
+    """
+    docs, bodies, signatures, failed = [], [], {}, 0
+    for fname in os.listdir(input_dir):
+        if not fname.lower().endswith('.pdf'):
+            continue
+        pdf_path = os.path.join(input_dir, fname)
+        json_name = fname.replace('.pdf', '.json')
+        prefix = os.path.join(section_dir, os.path.splitext(json_name)[0] + round1a.SECTION_TEXT_SUFFIX)
+        try:
+            outline = round1a.process_pdf(pdf_path, shard_threshold, shard_workers, cache, prefix, metrics)
+        except Exception as e:
+            print(f"[ERROR] {fname}: {type(e).__name__}: {e}")
+            failed += 1
+            continue
+        if outlines_dir:
+            with open(os.path.join(outlines_dir, json_name), 'w', encoding='utf-8') as f:
+                json.dump(outline, f, ensure_ascii=False, indent=2)
+        docs.append((json_name, outline))
+        bodies.append(round1b.open_section_text(section_dir, outline))
+        signatures[json_name] = round1b.outline_signature(pdf_path)
+    return docs, bodies, signatures, failed
+
+
+def pipeline(args):
+    metrics = Metrics('pipeline', profile_path=args.profile).start()
+    os.makedirs(args.output, exist_ok=True)
+    if args.outlines:
+        os.makedirs(args.outlines, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='sections-') as tmp:
+        docs, bodies, signatures, failed = extract_outlines(
+            args.input, args.outlines or tmp, args.outlines, shard_threshold=args.shard_threshold,
+            shard_workers=args.shard_workers, cache=round1a.get_cache(args.cache_dir, args.cache_max_mb),
+            metrics=metrics)
+        print(f"[INFO] Extracted {len(docs)} outlines ({failed} failed)")
+        model, store, index = round1b.setup_ranking(args, metrics)
+        round1b.run_queries(args, model, store, index, metrics, docs=docs, bodies=bodies, signatures=signatures)
+    round1b.finish_run(args, index, metrics)
+    return 1 if failed else 0
+
+
+def watch(args, parser):
+    state_dir = args.state_dir or os.path.join(args.output, STATE_DIR)
+    ranker = None
+    if args.queries or args.persona is not None or args.job is not None:
+        round1b.check_arguments(parser, args)
+        # Warm state lives with the manifest unless placed elsewhere
+        args.embedding_cache = args.embedding_cache or os.path.join(state_dir, 'embeddings')
+        if args.corpus_top_k:
+            args.section_index = args.section_index or os.path.join(state_dir, 'section_index')
+        metrics = Metrics('round1b', sample_rss=False).start()
+        ranker = round1b.StandingQueries(args, metrics)
+        print(f"[INFO] Model loaded in {metrics.finish().stage_seconds()['model_load']:.2f}s")
+    watcher = Watcher(args.input, args.output, state_dir, workers=args.workers, timeout=args.timeout,
+                      shard_threshold=args.shard_threshold, shard_workers=args.shard_workers, cache_dir=args.cache_dir,
+                      cache_max_mb=args.cache_max_mb, ranker=ranker, metrics_path=args.metrics,
+                      settle=0 if args.once else args.settle)
+    watcher.run(args.interval, once=args.once)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Round 1A structure extraction and Round 1B persona ranking')
+    commands = parser.add_subparsers(dest='command', required=True)
+    round1a.add_arguments(commands.add_parser('extract', help='Round 1A: PDFs -> outline JSONs'))
+    round1b.add_arguments(commands.add_parser('rank', help='Round 1B: outline JSONs -> persona outputs'))
+    pipe = commands.add_parser('pipeline', help='Round 1A + 1B in one process, outlines passed in memory')
+    pipe.add_argument('--input', default='/app/input', help='Input directory of PDFs')
+    pipe.add_argument('--output', default='/app/output', help='Output directory for 1B JSONs')
+    pipe.add_argument('--outlines', default=None, help='Also write the Round 1A outlines and section sidecars here')
+    round1a.add_arguments(pipe, io=False)
+    round1b.add_arguments(pipe, io=False)
+    watch = commands.add_parser('watch', help='Extract new/changed PDFs as they arrive; rank them if a persona is given')
+    watch.add_argument('--input', default='/app/input', help='Directory of PDFs to watch')
+    watch.add_argument('--output', default='/app/output', help='Output directory for outlines (and 1B JSONs)')
+    watch.add_argument('--state-dir', default=None, help=f'Manifest and warm caches (default: <output>/{STATE_DIR})')
+    watch.add_argument('--interval', type=float, default=WATCH_INTERVAL, help='Seconds between directory scans')
+    watch.add_argument('--settle', type=float, default=WATCH_SETTLE_SEC, help='Skip PDFs modified less than this many seconds ago')
+    watch.add_argument('--once', action='store_true', help='Process pending changes once and exit')
+    watch.add_argument('--workers', type=int, default=1, help='Process pool size for Round 1A')
+    watch.add_argument('--timeout', type=float, default=None, help='Per-document timeout in seconds')
+    round1a.add_arguments(watch, io=False)
+    round1b.add_arguments(watch, io=False)
+    return parser, commands
+
+
+def main(argv=None):
+    parser, commands = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'extract':
+        return round1a.main(args)
+    if args.command == 'watch':
+        return watch(args, commands.choices['watch'])
+    round1b.check_arguments(commands.choices[args.command], args)
+    return round1b.main(args) if args.command == 'rank' else pipeline(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
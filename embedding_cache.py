@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import hashlib
+import unicodedata
+import numpy as np
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: single-writer only
+    fcntl = None
+
+# --- Store config ---
+KEY_BYTES = 16
+DEFAULT_DTYPE = 'float32'  # or float16 to halve disk and page-cache use
+
+
+def normalize_text(text):
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def text_key(model_name, text):
+    return hashlib.blake2b(f'{model_name}\0{normalize_text(text)}'.encode('utf-8'), digest_size=KEY_BYTES).digest()
+
+
+def read_keys(path):
+    # Raw 16-byte digests (numpy 'S' dtypes would strip trailing NUL bytes)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [data[i:i + KEY_BYTES] for i in range(0, len(data) - KEY_BYTES + 1, KEY_BYTES)]
+
+
+class EmbeddingStore:
+    """
+    Disk-backed embedding cache for one model, keyed by (model name, normalized text hash).
+    Each generation is a keys file (16-byte digests, one per row), a vectors file (rows x dim,
+    memory-mapped read-only for lookups) and an access file (last-used epoch seconds per row).
+    New vectors are appended under a file lock; compaction writes a new generation and
+    switches meta.json atomically, so readers never see a half-written store.
+    """
+    def __init__(self, root, model_name, dtype=DEFAULT_DTYPE, max_rows=None):
+        self.root = os.path.join(root, hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:12])
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.max_rows = max_rows
+        os.makedirs(self.root, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'appended': 0, 'compactions': 0}
+        self._touched = {}
+        self._load()
+
+    # --- files ---
+    def _meta_path(self):
+        return os.path.join(self.root, 'meta.json')
+
+    def _file(self, kind, gen=None):
+        return os.path.join(self.root, f'{kind}.{self.gen if gen is None else gen}.bin')
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.root, '.lock'), 'a') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_meta(self, meta):
+        tmp = self._meta_path() + f'.tmp-{os.getpid()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path())
+
+    def _load(self):
+        try:
+            with open(self._meta_path(), encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {'model': self.model_name, 'dim': None, 'dtype': self.dtype.name, 'gen': 0}
+        self.gen = meta['gen']
+        self.dim = meta['dim']
+        self.dtype = np.dtype(meta['dtype'])
+        keys_path = self._file('keys')
+        keys = read_keys(keys_path)
+        rows = len(keys)
+        vectors_path = self._file('vectors')
+        if self.dim and os.path.exists(vectors_path):
+            # Rows are committed once their key is written; ignore any trailing partial vector
+            rows = min(rows, os.path.getsize(vectors_path) // (self.dim * self.dtype.itemsize))
+        else:
+            rows = 0  # no vectors written yet for this generation
+        self.index = {k: i for i, k in enumerate(keys[:rows])}
+        self.rows = rows
+        self._keys_size = os.path.getsize(keys_path) if os.path.exists(keys_path) else 0
+        self.vectors = np.memmap(self._file('vectors'), dtype=self.dtype, mode='r', shape=(rows, self.dim)) if rows else None
+
+    def _refresh(self):
+        # Pick up rows appended by other processes, or a new generation after compaction
+        try:
+            with open(self._meta_path(), encoding='utf-8') as f:
+                gen = json.load(f)['gen']
+        except FileNotFoundError:
+            return
+        keys_path = self._file('keys', gen)
+        if gen != self.gen or (os.path.exists(keys_path) and os.path.getsize(keys_path) != self._keys_size):
+            self._load()
+
+    # --- lookups ---
+    def get(self, texts):
+        """Returns (vectors for the texts found, as a float32 array, and indices of the missing texts)."""
+        self._refresh()
+        rows, found, missing = [], [], []
+        now = int(time.time())
+        for i, text in enumerate(texts):
+            key = text_key(self.model_name, text)
+            row = self.index.get(key)
+            if row is None:
+                missing.append(i)
+            else:
+                rows.append(row)
+                found.append(i)
+                self._touched[key] = now
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(missing)
+        vecs = self.vectors[rows].astype(np.float32, copy=False) if rows else np.zeros((0, self.dim or 0), dtype=np.float32)
+        return vecs, found, missing
+
+    def put(self, texts, vectors):
+        vectors = np.asarray(vectors)
+        if not len(texts):
+            return
+        with self._lock():
+            self._refresh()
+            first = self.dim is None
+            if first:
+                self.dim = int(vectors.shape[1])
+            keys, rows, seen = [], [], set()  # list keeps write order; set keeps the duplicate check O(1)
+            for text, vec in zip(texts, vectors):
+                key = text_key(self.model_name, text)
+                if key in self.index or key in seen:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                rows.append(vec)
+            if not keys:
+                return
+            # Vectors first, then keys: a key on disk always has its vector
+            with open(self._file('vectors'), 'ab') as f:
+                f.write(np.asarray(rows, dtype=self.dtype).tobytes())
+            with open(self._file('keys'), 'ab') as f:
+                f.write(b''.join(keys))
+            if first:
+                # dim is persisted only once the first rows are on disk
+                self._write_meta({'model': self.model_name, 'dim': self.dim, 'dtype': self.dtype.name, 'gen': self.gen})
+            self.stats['appended'] += len(keys)
+            self._load()
+        if self.max_rows and self.rows > self.max_rows:
+            self.compact(self.max_rows)
+
+    # --- maintenance ---
+    def _access_times(self):
+        path = self._file('access')
+        times = np.fromfile(path, dtype=np.uint32) if os.path.exists(path) else np.zeros(0, dtype=np.uint32)
+        out = np.zeros(self.rows, dtype=np.uint32)
+        out[:min(len(times), self.rows)] = times[:self.rows]
+        return out
+
+    def flush(self):
+        # Persist last-used times so compaction keeps recently used rows
+        if not self._touched or not self.rows:
+            self._touched = {}
+            return
+        with self._lock():
+            self._refresh()
+            times = self._access_times()
+            touched = [(self.index[k], t) for k, t in self._touched.items() if k in self.index]
+            if touched:
+                rows, stamps = (np.array(col) for col in zip(*touched))
+                times[rows] = np.maximum(times[rows], stamps.astype(np.uint32))
+                times.tofile(self._file('access'))
+        self._touched = {}
+
+    def compact(self, max_rows=None):
+        """Rewrites the store into a new generation, dropping duplicates and the least recently used rows."""
+        self.flush()
+        with self._lock():
+            self._load()
+            if not self.rows:
+                return
+            times = self._access_times()
+            keys = read_keys(self._file('keys'))[:self.rows]
+            first = {}
+            for row, key in enumerate(keys):
+                first.setdefault(key, row)
+            keep = np.array(sorted(first.values()), dtype=np.int64)
+            if max_rows is not None and len(keep) > max_rows:
+                # Most recently used first; ties keep the newer row
+                order = np.lexsort((-keep, -times[keep].astype(np.int64)))
+                keep = np.sort(keep[order[:max_rows]])
+            new_gen = self.gen + 1
+            np.asarray(self.vectors[keep]).tofile(self._file('vectors', new_gen))
+            with open(self._file('keys', new_gen), 'wb') as f:
+                f.write(b''.join(keys[row] for row in keep.tolist()))
+            times[keep].tofile(self._file('access', new_gen))
+            old_gen = self.gen
+            self._write_meta({'model': self.model_name, 'dim': self.dim, 'dtype': self.dtype.name, 'gen': new_gen})
+            for kind in ('vectors', 'keys', 'access'):
+                # Readers that still map the old generation keep their open file on POSIX
+                try:
+                    os.remove(self._file(kind, old_gen))
+                except FileNotFoundError:
+                    pass
+            self.stats['compactions'] += 1
+            self._load()
+
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(self.stats, rows=self.rows, dtype=self.dtype.name,
+                    hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else None)
@@ -1,15 +1,24 @@
 import os
-from flask import Flask, request, render_template, send_from_directory, jsonify
+import sys
+import threading
+import multiprocessing
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, request, render_template, send_from_directory, jsonify, url_for, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import json
 
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'output'
+CACHE_FOLDER = 'cache'  # content-addressed Round 1A cache; unchanged uploads are not re-extracted
 ALLOWED_EXTENSIONS = {'pdf'}
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
@@ -17,87 +26,215 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 def index():
     return render_template('index.html')
 
-import subprocess
+# Round 1A/1B run in this process: extraction in a warm process pool, persona ranking on a resident model
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+import round1a_structure_extractor as round1a
+from outline_cache import file_sha256
+from job_queue import JobScheduler, QueueFull, DEFAULT_PRIORITY
+from instrumentation import Metrics, MetricsRegistry
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
+EXTRACT_WORKERS = int(os.environ.get('EXTRACT_WORKERS', 2))  # warm Round 1A processes
+MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', 4))  # jobs processed at once
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 64))  # waiting jobs before submissions get 503
+EXTRACT_TIMEOUT = float(os.environ.get('EXTRACT_TIMEOUT', 120))  # seconds per PDF
+EMBED_BACKEND = os.environ.get('EMBED_BACKEND', 'torch')  # torch | onnx | onnx-int8 (Round 1B encoder)
+MAX_POLL_WAIT = 30  # seconds a /jobs/<id>?wait= request may block
+STREAM_STATS_PAGES = int(os.environ['STREAM_STATS_PAGES']) if os.environ.get('STREAM_STATS_PAGES') else None  # see iter_outline
+STREAM_POLL_SEC = 0.05  # how often /jobs/<id>/events checks the NDJSON file for new records
+
+_pool_lock = threading.Lock()
+_extract_pool = None
+_scheduler = None
+_metrics = MetricsRegistry()  # running stage totals, served by /metrics
+
+def get_extract_pool():
+    # Created on first use so the debug reloader's parent process never spawns workers
+    global _extract_pool
+    with _pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _extract_pool
+
+def get_scheduler():
+    # Also lazy: spawned extraction workers import this module and must not start job threads
+    global _scheduler
+    with _pool_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler(MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS)
+        return _scheduler
+
+def get_ranker():
+    # Imported on first persona request: spawned extraction workers re-import this module and skip torch.
+    # load_model memoizes, so the SentenceTransformer stays resident afterwards.
+    import round1b_persona_intelligence as round1b
+    return round1b, round1b.load_model(backend=EMBED_BACKEND)
+
+def stream_path(filename):
+    return os.path.join(app.config['OUTPUT_FOLDER'], filename.replace('.pdf', '.ndjson'))
+
+def extract_outline(filename, stream=False, section_text=False):
+    """Runs Round 1A on one uploaded PDF in the warm pool; returns (outline JSON, error).
+    With stream, the worker writes NDJSON records as it goes (served by /jobs/<id>/events).
+    With section_text, section bodies are written to the <name>.sections sidecar for Round 1B."""
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    output_path = os.path.join(app.config['OUTPUT_FOLDER'], filename.replace('.pdf', '.json'))
+    cache_dir = app.config['CACHE_FOLDER'] and os.path.abspath(app.config['CACHE_FOLDER'])
+    future = get_extract_pool().submit(
+        round1a.extract_to_file, os.path.abspath(filepath), os.path.abspath(stream_path(filename) if stream else output_path),
+        EXTRACT_TIMEOUT, round1a.SHARD_PAGE_THRESHOLD, 1, cache_dir, round1a.DEFAULT_CACHE_MAX_MB,
+        stream, STREAM_STATS_PAGES, section_text)
+    try:
+        _, error, _, _, run_metrics = future.result()
+        _metrics.add('round1a', run_metrics)
+    except BrokenProcessPool as e:
+        global _extract_pool
+        with _pool_lock:
+            _extract_pool = None  # replaced on the next request
+        error = f'worker process crashed: {e}'
+    if error:
+        return None, error
+    if stream:
+        # Keep the regular JSON next to the stream for the download links
+        with open(stream_path(filename), encoding='utf-8') as f:
+            outline = round1a.outline_from_records(json.loads(line) for line in f)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(outline, f, ensure_ascii=False, indent=2)
+        return outline, None
+    with open(output_path, encoding='utf-8') as f:
+        return json.load(f), None
+
+def save_upload():
+    """Validates and saves the uploaded PDF under a content-addressed name (<sha256 prefix>-<name>), so queued
+    jobs, their outputs and stream files never see a later upload with the same name; returns
+    (filename, digest, error response)."""
     if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
+        return None, None, (jsonify({'error': 'No file part'}), 400)
     file = request.files['file']
     if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        # Call backend structure extractor
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], filename.replace('.pdf', '.json'))
-        # Run extraction script (simulate here, replace with real call)
-        try:
-            # CASCADE PATCH: use absolute path for round1a_structure_extractor.py
-            round1a_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'round1a_structure_extractor.py'))
-            ret = subprocess.run([
-                'python', round1a_path,
-                '--input', app.config['UPLOAD_FOLDER'],
-                '--output', app.config['OUTPUT_FOLDER']
-            ], check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            print('STDOUT:', e.stdout)
-            print('STDERR:', e.stderr)
-            return jsonify({'error': f'Extraction failed: {e}\nSTDOUT:\n{e.stdout}\nSTDERR:\n{e.stderr}'}), 500
-        if not os.path.exists(output_path):
-            return jsonify({'error': 'No output generated'}), 500
-        with open(output_path) as f:
-            output_json = json.load(f)
-        return jsonify({'filename': filename, 'output': output_json})
-    return jsonify({'error': 'Invalid file type'}), 400
+        return None, None, (jsonify({'error': 'No selected file'}), 400)
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({'error': 'Invalid file type'}), 400)
+    fd, tmp = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], prefix='.upload-', suffix='.pdf')
+    with os.fdopen(fd, 'wb') as f:
+        file.save(f)
+    digest = file_sha256(tmp)
+    filename = f'{digest[:16]}-{secure_filename(file.filename)}'
+    # Same name implies same content, so replacing an existing copy is harmless to jobs reading it
+    os.replace(tmp, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+    return filename, digest, None
+
+def run_structure_job(filename):
+    outline, error = extract_outline(filename, stream=True)
+    if error:
+        raise RuntimeError(f'Extraction failed: {error}')
+    return {'filename': filename, 'output': outline}
+
+def run_persona_job(filename, persona, job):
+    outline, error = extract_outline(filename, section_text=True)
+    if error:
+        raise RuntimeError(f'Extraction failed: {error}')
+    # Only the uploaded document is ranked, against the resident model; highlights come from section bodies
+    json_name = filename.replace('.pdf', '.json')
+    round1b, model = get_ranker()
+    bodies = [round1b.open_section_text(app.config['OUTPUT_FOLDER'], outline)]
+    metrics = Metrics('round1b', sample_rss=False).start()
+    [(_, output_json)] = round1b.rank_documents([(json_name, outline)], persona, job, model, bodies=bodies, metrics=metrics)
+    metrics.finish()
+    output_json['explainability_and_compliance'] = round1b.explainability_block(
+        output_json, metrics.wall_sec, metrics.peak_rss_mb, metrics.stage_seconds())
+    _metrics.add('round1b', metrics.to_dict())
+    out_path = os.path.join(app.config['OUTPUT_FOLDER'], json_name.replace('.json', '_challenge1b_output.json'))
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(output_json, f, ensure_ascii=False, indent=2)
+    return {'filename': filename, 'output': output_json}
+
+def submit_upload(kind, fn, **params):
+    """Saves the upload and queues a job; identical content + parameters reuse the earlier job."""
+    filename, digest, error_response = save_upload()
+    if error_response:
+        return error_response
+    key = (kind, digest) + tuple(sorted(params.items()))
+    priority = request.form.get('priority', DEFAULT_PRIORITY, type=int)
+    try:
+        job, reused = get_scheduler().submit(kind, fn, dict(filename=filename, **params), priority, key)
+    except QueueFull:
+        return jsonify({'error': 'Job queue is full, retry shortly'}), 503, {'Retry-After': '5'}
+    info = job.to_dict(with_result=False)
+    info.update(reused=reused, status_url=url_for('job_status', job_id=job.id))
+    return jsonify(info), 202
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    return submit_upload('structure', run_structure_job)
 
 @app.route('/persona_upload', methods=['POST'])
 def persona_upload():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['file']
-    persona = request.form.get('persona', '')
-    job = request.form.get('job', '')
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        # Run structure extractor first
-        try:
-            # CASCADE PATCH: use absolute path for round1a_structure_extractor.py
-            round1a_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'round1a_structure_extractor.py'))
-            ret = subprocess.run([
-                'python', round1a_path,
-                '--input', app.config['UPLOAD_FOLDER'],
-                '--output', app.config['OUTPUT_FOLDER']
-            ], check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            print('STDOUT:', e.stdout)
-            print('STDERR:', e.stderr)
-            return jsonify({'error': f'Extraction failed: {e}\nSTDOUT:\n{e.stdout}\nSTDERR:\n{e.stderr}'}), 500
-        # Now run persona intelligence
-        json_input_path = os.path.join(app.config['OUTPUT_FOLDER'], filename.replace('.pdf', '.json'))
-        try:
-            round1b_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'round1b_persona_intelligence.py'))
-            ret2 = subprocess.run([
-                'python', round1b_path,
-                '--input', app.config['OUTPUT_FOLDER'],
-                '--output', app.config['OUTPUT_FOLDER'],
-                '--persona', persona,
-                '--job', job
-            ], check=True, capture_output=True, text=True)
-        except Exception as e:
-            return jsonify({'error': f'Persona intelligence failed: {e}'}), 500
-        out_path = json_input_path.replace('.json', '_challenge1b_output.json')
-        if not os.path.exists(out_path):
-            return jsonify({'error': 'No persona output generated'}), 500
-        with open(out_path) as f:
-            output_json = json.load(f)
-        return jsonify({'filename': filename, 'output': output_json})
-    return jsonify({'error': 'Invalid file type'}), 400
+    return submit_upload('persona', run_persona_job,
+                         persona=request.form.get('persona', ''), job=request.form.get('job', ''))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Stage timings, counters and peak RSS summed over every job so far (Prometheus text format)
+    return Response(_metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs')
+def job_stats():
+    return jsonify(get_scheduler().stats())
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    # ?wait=N blocks up to N seconds for the job to finish, so clients can long-poll
+    job = get_scheduler().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    wait = min(request.args.get('wait', 0, type=float), MAX_POLL_WAIT)
+    if wait > 0:
+        job.done.wait(wait)
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = get_scheduler().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job.status == 'done':
+        return jsonify(job.result)
+    if job.status == 'failed':
+        return jsonify({'error': job.error}), 500
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events for a structure job: each NDJSON record as it is written, then an 'end' event."""
+    job = get_scheduler().get(job_id)
+    if job is None or job.kind != 'structure':
+        return jsonify({'error': 'Unknown structure job'}), 404
+    path = stream_path(job.args['filename'])
+
+    def fresh():
+        # True once this job's worker has (re)created the file; older runs may have left one behind.
+        # The slack covers coarse filesystem timestamps lagging time.time().
+        return job.started_at is not None and os.path.exists(path) and os.stat(path).st_mtime >= job.started_at - 0.01
+
+    def events():
+        while not fresh() and not job.done.is_set():
+            time.sleep(STREAM_POLL_SEC)
+        if fresh():
+            pending = ''
+            with open(path, encoding='utf-8') as f:
+                while True:
+                    finished = job.done.is_set()
+                    pending += f.read()
+                    *lines, pending = pending.split('\n')
+                    for line in lines:
+                        yield f'data: {line}\n\n'
+                    if finished:
+                        break
+                    time.sleep(STREAM_POLL_SEC)
+        yield f'event: end\ndata: {json.dumps(job.to_dict(with_result=False))}\n\n'
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @app.route('/output/<filename>')
 def get_output(filename):
@@ -0,0 +1,128 @@
+import time
+import uuid
+import queue
+import itertools
+import threading
+from collections import OrderedDict
+
+# --- Scheduler config ---
+DEFAULT_PRIORITY = 5  # lower runs sooner
+MAX_JOBS_RETAINED = 1000  # finished jobs kept for /jobs/<id> lookups
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, fn, args, priority, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self, with_result=True):
+        info = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'submitted_at': self.submitted_at,
+            'queue_sec': round((self.started_at or time.time()) - self.submitted_at, 3),
+        }
+        if self.finished_at:
+            info['run_sec'] = round(self.finished_at - self.started_at, 3)
+        if self.error:
+            info['error'] = self.error
+        if with_result and self.status == 'done':
+            info['result'] = self.result
+        return info
+
+
+class JobScheduler:
+    """
+    Runs submitted jobs on a fixed number of worker threads, lowest priority value first (FIFO within a
+    priority). At most max_queued jobs may wait; beyond that submit raises QueueFull so callers can
+    shed load. Jobs with the same key (e.g. same PDF content and persona) share one run and result.
+    """
+    def __init__(self, workers, max_queued):
+        self.max_queued = max_queued
+        self.queue = queue.PriorityQueue()
+        self.jobs = OrderedDict()
+        self.by_key = {}
+        self.lock = threading.Lock()
+        self.seq = itertools.count()
+        self.queued = 0
+        self.threads = [threading.Thread(target=self._worker, daemon=True, name=f'job-worker-{i}') for i in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, kind, fn, args, priority=DEFAULT_PRIORITY, key=None):
+        """Returns (job, reused); reused is True when an identical job already ran or is pending."""
+        with self.lock:
+            if key is not None and key in self.by_key:
+                job = self.jobs.get(self.by_key[key])
+                if job is not None and job.status != 'failed':
+                    return job, True
+            if self.queued >= self.max_queued:
+                raise QueueFull(f'{self.queued} jobs already queued')
+            job = Job(kind, fn, args, priority, key)
+            self.jobs[job.id] = job
+            if key is not None:
+                self.by_key[key] = job.id
+            self.queued += 1
+            self._trim()
+        self.queue.put((priority, next(self.seq), job.id))
+        return job, False
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'workers': len(self.threads), 'queued': self.queued, 'max_queued': self.max_queued, 'jobs': counts}
+
+    def _trim(self):
+        # Forget the oldest finished jobs once more than MAX_JOBS_RETAINED are tracked
+        excess = len(self.jobs) - MAX_JOBS_RETAINED
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            job = self.jobs[job_id]
+            if job.status in ('done', 'failed'):
+                del self.jobs[job_id]
+                if job.key is not None and self.by_key.get(job.key) == job_id:
+                    del self.by_key[job.key]
+                excess -= 1
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self.queue.get()
+            with self.lock:
+                job = self.jobs.get(job_id)
+                self.queued -= 1
+                if job is None:
+                    continue
+                job.status = 'running'
+                job.started_at = time.time()
+            try:
+                job.result = job.fn(**job.args)
+                job.status = 'done'
+            except Exception as e:
+                job.error = f'{type(e).__name__}: {e}'
+                job.status = 'failed'
+            job.finished_at = time.time()
+            job.done.set()
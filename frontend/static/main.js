@@ -291,6 +291,25 @@ jobTemplate && jobTemplate.addEventListener('change', function() {
 // (Removed duplicate demoBtn declaration and logic as now handled above with dynamic injection)
 
 
+// Renders structure headings as the server streams them, before the job's final result arrives
+function streamOutline(url, status) {
+    const source = new EventSource(url);
+    const outline = [];
+    let title = '';
+    source.onmessage = function(e) {
+        const record = JSON.parse(e.data);
+        if (record.type === 'title') title = record.title;
+        if (record.type !== 'heading') return;
+        outline.push(record);
+        status.innerHTML = `<span class="spinner"></span> Analyzing... ${outline.length} headings so far (p.${record.page})`;
+        document.getElementById('dashboard').innerHTML = `<h3 class='title-block'>${title}</h3><h2>Document Outline</h2>${renderOutline(outline)}`;
+        document.getElementById('resultsSection').style.display = 'block';
+    };
+    source.addEventListener('end', () => source.close());
+    source.onerror = () => source.close();
+    return source;
+}
+
 document.getElementById('uploadForm').addEventListener('submit', async function(e) {
     e.preventDefault();
     const fileInput = document.getElementById('fileInput');
@@ -307,11 +326,25 @@ document.getElementById('uploadForm').addEventListener('submit', async function(
         formData.append('job', document.getElementById('jobInput').value);
     }
     try {
-        const res = await fetch(mode === 'structure' ? '/upload' : '/persona_upload', {
+        const submitted = await fetch(mode === 'structure' ? '/upload' : '/persona_upload', {
             method: 'POST',
             body: formData
         });
-        const data = await res.json();
+        let job = await submitted.json();
+        if (!submitted.ok) {
+            status.innerHTML = `<span style='color:#e53935'>${job.error || 'Upload failed.'}</span>`;
+            return;
+        }
+        // The server queues the work and returns a job id; long-poll until it finishes
+        status.innerHTML = '<span class="spinner"></span> Analyzing...';
+        const events = mode === 'structure' ? streamOutline(`${job.status_url}/events`, status) : null;
+        while (job.status === 'queued' || job.status === 'running') {
+            const poll = await fetch(`${job.status_url}?wait=10`);
+            job = Object.assign(await poll.json(), {status_url: job.status_url});
+        }
+        if (events) events.close();
+        const res = {ok: job.status === 'done'};
+        const data = job.status === 'done' ? job.result : {error: job.error};
         if (res.ok) {
             status.innerHTML = '<span style="color:#43a047">✔ Analysis complete!</span>';
             showDashboard(data.output, mode, data.filename);
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+import psutil
+
+# --- Instrumentation config ---
+RSS_SAMPLE_INTERVAL = 0.02  # seconds between background RSS samples (shorter intervals contend for the GIL)
+METRIC_PREFIX = 'pdf_intel'
+MB = 1024 * 1024
+
+
+class RssSampler:
+    """
+    Background thread reading this process's RSS every interval. Keeps the overall peak and, for each
+    open mark, the peak since the mark was set, so short spikes (KMeans, get_text, an encode batch)
+    between two snapshots are not missed. Child processes (sharded parsing) are not included.
+    """
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.marks = {}
+        self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        with self.lock:
+            self.peak = max(self.peak, rss)
+            for key, peak in self.marks.items():
+                self.marks[key] = max(peak, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name='rss-sampler')
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sample()
+
+    def mark(self, key):
+        rss = self.sample()
+        with self.lock:
+            self.marks[key] = rss
+
+    def release(self, key):
+        self.sample()
+        with self.lock:
+            return self.marks.pop(key)
+
+
+class Metrics:
+    """
+    Instrumentation for one run (a Round 1A document or a Round 1B batch): per-stage wall time, calls and
+    sampled peak RSS, event counters (pages, spans, encode calls, ...) and value observations
+    (count/sum/min/max, e.g. texts per encode call). start() launches the RSS sampler, and cProfile when
+    profile_path is set; finish() stops both and dumps the profile. Stages may nest.
+    """
+    def __init__(self, name, profile_path=None, sample_rss=True):
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        self.observations = {}
+        self.profile_path = profile_path
+        self.profiler = None
+        self.sampler = RssSampler() if sample_rss else None
+        self.started_at = None
+        self.wall_sec = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.profile_path:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def finish(self):
+        if self.wall_sec is not None:
+            return self
+        if self.profiler is not None:
+            self.profiler.disable()
+            os.makedirs(os.path.dirname(os.path.abspath(self.profile_path)), exist_ok=True)
+            self.profiler.dump_stats(self.profile_path)
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.wall_sec = time.perf_counter() - (self.started_at or time.perf_counter())
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        token = object()
+        if self.sampler is not None:
+            self.sampler.mark(token)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += time.perf_counter() - t0
+            entry['calls'] += 1
+            if self.sampler is not None:
+                entry['peak_rss_mb'] = max(entry.get('peak_rss_mb', 0.0), self.sampler.release(token) / MB)
+
+    def add_time(self, name, seconds, calls=1):
+        # For hot loops: stage time without the RSS marks (the sampler still sees the overall peak)
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        entry['seconds'] += seconds
+        entry['calls'] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        obs = self.observations.get(name)
+        if obs is None:
+            self.observations[name] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+        else:
+            obs['count'] += 1
+            obs['sum'] += value
+            obs['min'] = min(obs['min'], value)
+            obs['max'] = max(obs['max'], value)
+
+    @property
+    def peak_rss_mb(self):
+        # Sampled peak so far (also valid mid-run)
+        if self.sampler is None:
+            return psutil.Process().memory_info().rss / MB
+        self.sampler.sample()
+        return self.sampler.peak / MB
+
+    def stage_seconds(self):
+        return {name: round(entry['seconds'], 3) for name, entry in self.stages.items()}
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'wall_sec': round(self.wall_sec if self.wall_sec is not None else time.perf_counter() - self.started_at, 4),
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'stages': {name: dict(e, seconds=round(e['seconds'], 4), **({'peak_rss_mb': round(e['peak_rss_mb'], 1)}
+                                                                         if 'peak_rss_mb' in e else {}))
+                       for name, e in self.stages.items()},
+            'counters': dict(self.counters),
+            'observations': {name: dict(obs) for name, obs in self.observations.items()},
+        }
+
+
+def merge_runs(runs, name='total'):
+    """Sums stage times, calls and counters of Metrics.to_dict() results; peaks are maxima."""
+    total = {'name': name, 'runs': 0, 'wall_sec': 0.0, 'peak_rss_mb': 0.0, 'stages': {}, 'counters': {}, 'observations': {}}
+    for run in runs:
+        total['runs'] += run.get('runs', 1)
+        total['wall_sec'] = round(total['wall_sec'] + run['wall_sec'], 4)
+        total['peak_rss_mb'] = max(total['peak_rss_mb'], run['peak_rss_mb'])
+        for stage, e in run['stages'].items():
+            t = total['stages'].setdefault(stage, {'seconds': 0.0, 'calls': 0})
+            t['seconds'] = round(t['seconds'] + e['seconds'], 4)
+            t['calls'] += e['calls']
+            if 'peak_rss_mb' in e:
+                t['peak_rss_mb'] = max(t.get('peak_rss_mb', 0.0), e['peak_rss_mb'])
+        for key, n in run['counters'].items():
+            total['counters'][key] = total['counters'].get(key, 0) + n
+        for key, obs in run['observations'].items():
+            t = total['observations'].get(key)
+            if t is None:
+                total['observations'][key] = dict(obs)
+            else:
+                t.update(count=t['count'] + obs['count'], sum=t['sum'] + obs['sum'],
+                         min=min(t['min'], obs['min']), max=max(t['max'], obs['max']))
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def to_prometheus(runs, prefix=METRIC_PREFIX):
+    """Prometheus text exposition of Metrics.to_dict() results, one label set per run."""
+    families = [
+        ('stage_seconds_total', 'counter', 'Wall time spent in each stage'),
+        ('stage_calls_total', 'counter', 'Times each stage ran'),
+        ('stage_peak_rss_bytes', 'gauge', 'Sampled peak RSS while the stage ran'),
+        ('events_total', 'counter', 'Per-run counters (pages, spans, headings, encode calls, ...)'),
+        ('observed_count', 'counter', 'Number of observations'),
+        ('observed_sum', 'counter', 'Sum of observed values'),
+        ('observed_max', 'gauge', 'Largest observed value'),
+        ('peak_rss_bytes', 'gauge', 'Sampled peak RSS of the run'),
+        ('wall_seconds', 'gauge', 'Wall time of the run'),
+    ]
+    samples = {family: [] for family, _, _ in families}
+    for run in runs:
+        name = run['name']
+        for stage, e in run['stages'].items():
+            samples['stage_seconds_total'].append((_labels(run=name, stage=stage), e['seconds']))
+            samples['stage_calls_total'].append((_labels(run=name, stage=stage), e['calls']))
+            if 'peak_rss_mb' in e:
+                samples['stage_peak_rss_bytes'].append((_labels(run=name, stage=stage), int(e['peak_rss_mb'] * MB)))
+        for key, n in run['counters'].items():
+            samples['events_total'].append((_labels(run=name, event=key), n))
+        for key, obs in run['observations'].items():
+            for stat in ('count', 'sum', 'max'):
+                samples[f'observed_{stat}'].append((_labels(run=name, name=key), obs[stat]))
+        samples['peak_rss_bytes'].append((_labels(run=name), int(run['peak_rss_mb'] * MB)))
+        samples['wall_seconds'].append((_labels(run=name), run['wall_sec']))
+    lines = []
+    for family, kind, help_text in families:
+        if not samples[family]:
+            continue
+        lines.append(f'# HELP {prefix}_{family} {help_text}')
+        lines.append(f'# TYPE {prefix}_{family} {kind}')
+        lines.extend(f'{prefix}_{family}{labels} {value}' for labels, value in samples[family])
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path, runs):
+    # .prom / .txt -> Prometheus text format, anything else -> JSON with every run and their total
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith(('.prom', '.txt')):
+            f.write(to_prometheus(runs))
+        else:
+            json.dump({'runs': runs, 'total': merge_runs(runs)}, f, indent=2)
+
+
+class MetricsRegistry:
+    """Running totals per kind (e.g. round1a, round1b) for a long-lived process such as the web app."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def add(self, kind, run):
+        if not run:
+            return
+        with self.lock:
+            self.totals[kind] = merge_runs([self.totals[kind], run] if kind in self.totals else [run], name=kind)
+
+    def runs(self):
+        with self.lock:
+            return list(self.totals.values())
+
+    def to_prometheus(self):
+        return to_prometheus(self.runs())
@@ -0,0 +1,125 @@
+import os
+import json
+import inspect
+import numpy as np
+
+# --- ONNX backend config ---
+ONNX_OPSET = 14
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model-int8.onnx'
+META_FILE = 'embedder.json'
+POOLING_MODES = ('mean', 'cls')
+
+
+def export_onnx(model_name_or_dir, out_dir, quantize=True):
+    """
+    Exports a SentenceTransformer's transformer to out_dir as an ONNX graph (plus a dynamically
+    int8-quantized copy), with its fast tokenizer and the pooling/normalization settings needed to
+    reproduce encode() without torch. Needs torch and sentence-transformers; loading does not.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    st = SentenceTransformer(model_name_or_dir, device='cpu')
+    transformer = st[0]
+    pooling = next(m for m in st if isinstance(m, models.Pooling))
+    mode = pooling.get_pooling_mode_str()
+    if mode not in POOLING_MODES:
+        raise ValueError(f'Unsupported pooling mode for ONNX export: {mode}')
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(out_dir)
+    dummy = tokenizer(['export sample text'], return_tensors='pt', padding=True)
+    input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in dummy]
+    dynamic = {n: {0: 'batch', 1: 'seq'} for n in input_names + ['last_hidden_state']}
+    # Newer torch defaults to the dynamo exporter (needs onnxscript); the TorchScript exporter covers BERT
+    legacy = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(transformer.auto_model.eval(), tuple(dummy[n] for n in input_names),
+                          os.path.join(out_dir, FP32_FILE), input_names=input_names,
+                          output_names=['last_hidden_state'], dynamic_axes=dynamic, opset_version=ONNX_OPSET, **legacy)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(os.path.join(out_dir, FP32_FILE), os.path.join(out_dir, INT8_FILE), weight_type=QuantType.QInt8)
+    meta = {
+        'source': model_name_or_dir,
+        'dim': st.get_sentence_embedding_dimension(),
+        'max_seq_length': st.max_seq_length,
+        'pooling': mode,
+        'normalize': any(isinstance(m, models.Normalize) for m in st),
+        'pad_token': tokenizer.pad_token,
+        'pad_id': tokenizer.pad_token_id,
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return out_dir
+
+
+def is_exported(onnx_dir, quantized=False):
+    return all(os.path.exists(os.path.join(onnx_dir, name))
+               for name in (META_FILE, 'tokenizer.json', INT8_FILE if quantized else FP32_FILE))
+
+
+class OnnxEmbedder:
+    """
+    Stand-in for SentenceTransformer.encode on an exported graph: Rust fast tokenizer, onnxruntime
+    CPU session, then the same pooling and normalization. Batches are formed longest-first so
+    padding stays short, and rows are returned in input order.
+    """
+    def __init__(self, onnx_dir, quantized=False, threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError('onnxruntime is required for the onnx embedding backends') from e
+        from tokenizers import Tokenizer
+        with open(os.path.join(onnx_dir, META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(onnx_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(self.meta['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.meta['pad_id'], pad_token=self.meta['pad_token'])
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(onnx_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.meta['dim']
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': np.array([e.ids for e in encodings], dtype=np.int64), 'attention_mask': mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(['last_hidden_state'], feeds)[0]
+        if self.meta['pooling'] == 'cls':
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.meta['normalize']:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def encode(self, texts, show_progress_bar=False, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), self.meta['dim']), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._embed_batch([texts[i] for i in idx])
+        return out[0] if single else out
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Export a SentenceTransformer to ONNX (fp32 + dynamic int8)')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help='Model name or local SentenceTransformer directory')
+    parser.add_argument('--out', required=True, help='Output directory for the exported graphs')
+    parser.add_argument('--no-quantize', action='store_true')
+    args = parser.parse_args()
+    export_onnx(args.model, args.out, quantize=not args.no_quantize)
+    print(f"[INFO] Exported {args.model} to {args.out}")
@@ -0,0 +1,151 @@
+import os
+import io
+import json
+import hashlib
+import tempfile
+
+# --- Cache config ---
+DEFAULT_CACHE_MAX_MB = 1024
+EVICT_TO_FRACTION = 0.9  # evict down to this share of the limit so we don't evict on every write
+HASH_CHUNK = 1 << 20
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class OutlineCache:
+    """
+    Content-addressed on-disk cache for Round 1A.
+    outlines/<key>.json holds finished results keyed by PDF hash + extractor config;
+    spans/<key>.npz holds parsed span features keyed by PDF hash + parser config, so a
+    heuristics-only change skips PDF parsing. Writes go through a temp file and os.replace,
+    so concurrent workers never see partial entries. Entries are evicted least-recently-used
+    (mtime is bumped on every hit) once the directory exceeds max_bytes.
+    """
+    def __init__(self, root, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        for kind in ('outlines', 'spans'):
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+        self.stats = {'outline_hits': 0, 'span_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._hashes = {}
+        self._size = self._scan_size()
+        if self._size > self.max_bytes:
+            self.evict()
+
+    # --- keys ---
+    def content_hash(self, path):
+        # Rehash only when the file's size or mtime changed since we last saw it in this process
+        st = os.stat(path)
+        stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if stat_key not in self._hashes:
+            self._hashes[stat_key] = file_sha256(path)
+        return self._hashes[stat_key]
+
+    def _path(self, kind, key, ext):
+        return os.path.join(self.root, kind, f'{key}{ext}')
+
+    # --- outlines ---
+    def get_outline(self, key):
+        path = self._path('outlines', key, '.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        self._touch(path)
+        self.stats['outline_hits'] += 1
+        return result
+
+    def put_outline(self, key, result):
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self._write(self._path('outlines', key, '.json'), data)
+
+    # --- span features ---
+    def get_spans(self, key):
+        # Returns raw npz bytes; the extractor owns the array layout
+        path = self._path('spans', key, '.npz')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        self.stats['span_hits'] += 1
+        return io.BytesIO(data)
+
+    def put_spans(self, key, data):
+        self._write(self._path('spans', key, '.npz'), data)
+
+    def record_miss(self):
+        self.stats['misses'] += 1
+
+    # --- storage ---
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.stats['writes'] += 1
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for kind in ('outlines', 'spans'):
+            folder = os.path.join(self.root, kind)
+            for name in os.listdir(folder):
+                if name.startswith('.tmp-'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                entries.append((st.st_mtime, st.st_size, os.path.join(folder, name)))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Rescan so sizes written by other workers count too, then drop least recently used entries
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO_FRACTION
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                self.stats['evictions'] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def summary(self):
+        lookups = self.stats['outline_hits'] + self.stats['span_hits'] + self.stats['misses']
+        hits = self.stats['outline_hits'] + self.stats['span_hits']
+        return dict(self.stats, size_mb=round(self._size / (1024 * 1024), 2),
+                    hit_rate=round(hits / lookups, 3) if lookups else None)
@@ -1,12 +1,20 @@
 import os
 import json
 import fitz  # PyMuPDF
-from collections import Counter, defaultdict
+from collections import Counter, defaultdict, OrderedDict
 import numpy as np
-from sklearn.cluster import KMeans
+import hashlib
 import re
 import time
-import psutil
+import io
+from importlib.metadata import version
+from outline_cache import OutlineCache, config_hash, DEFAULT_CACHE_MAX_MB
+from instrumentation import Metrics, merge_runs, write_metrics
+import signal
+import threading
+import itertools
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 
 # --- Heuristic config ---
 HEADING_MIN_FONT_SIZE_DIFF = 2  # points
@@ -14,6 +22,36 @@ HEADING_BOLDNESS_WEIGHT = 1.3  # multiplier for bold fonts
 LEFT_MARGIN_THRESHOLD = 40  # px, headings usually start near left margin
 LINE_SPACING_THRESHOLD = 1.5  # multiplier for spacing before/after
 KMEANS_CLUSTERS = 4  # For heading/body clustering
+KMEANS_MAX_UNIQUE = 5000  # unique (size, bold, left) rows above which MiniBatchKMeans is used
+CLUSTER_METHOD = 'auto'  # auto | kmeans | minibatch | histogram
+CENTER_CACHE_SIZE = 128  # style profiles whose fitted centers are kept in memory
+SHARD_PAGE_THRESHOLD = 400  # pages; larger documents are parsed in parallel page ranges
+SHARD_PAGES = 100  # pages per shard
+POOL_TIMEOUT_GRACE_SEC = 5.0  # a pool worker still busy this long past --timeout (stuck in C code) is killed
+
+EXTRACTOR_VERSION = 4  # bump when a code change alters outlines, to invalidate cached results
+SPAN_TABLE_VERSION = 1  # bump when the SpanTable layout or parsing changes
+
+# --- Section text sidecar config ---
+SECTION_TEXT_SUFFIX = '.sections'  # <name>.sections.txt (UTF-8 bodies) + <name>.sections.npy (byte offsets)
+PARAGRAPH_GAP = 0.5  # line gap, in body font sizes, that starts a new paragraph in a section body
+
+# --- Script detection config ---
+# A span's script is that of its first character in one of these ranges; anything else is LATIN.
+# Codes are indices into SCRIPT_NAMES (uint8 per span).
+SCRIPT_NAMES = ('LATIN', 'CJK', 'DEVANAGARI', 'ARABIC', 'HEBREW', 'THAI', 'CYRILLIC', 'HANGUL', 'GREEK')
+SCRIPT_RANGES = {
+    'CJK': [(0x3040, 0x30FF), (0x31F0, 0x31FF), (0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF),
+            (0x20000, 0x3134F)],  # kana, unified ideographs (incl. extensions A-G), compatibility ideographs
+    'DEVANAGARI': [(0x0900, 0x097F)],
+    'ARABIC': [(0x0600, 0x06FF), (0x0750, 0x077F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF)],  # + presentation forms
+    'HEBREW': [(0x0590, 0x05FF)],
+    'THAI': [(0x0E00, 0x0E7F)],
+    'CYRILLIC': [(0x0400, 0x052F)],
+    'HANGUL': [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)],
+    'GREEK': [(0x0370, 0x03FF), (0x1F00, 0x1FFF)],
+}
+SCRIPT_CHUNK_CHARS = 1 << 20  # codepoints decoded per step (4 bytes each)
 
 # --- Utility functions ---
 def is_bold(font_name):
@@ -22,19 +60,44 @@ def is_bold(font_name):
 def clean_text(text):
     return text.strip().replace('\n', ' ')
 
+def build_script_table():
+    # Codepoint -> script code lookup table, covering every range in SCRIPT_RANGES
+    top = max(hi for ranges in SCRIPT_RANGES.values() for _, hi in ranges)
+    table = np.zeros(top + 2, dtype=np.uint8)  # the last entry stays LATIN for codepoints past the table
+    for name, ranges in SCRIPT_RANGES.items():
+        for lo, hi in ranges:
+            table[lo:hi + 1] = SCRIPT_NAMES.index(name)
+    return table
+
+SCRIPT_TABLE = build_script_table()
+
+def span_scripts(text, offsets):
+    """
+    Script code of every span in one pass over a text buffer (span i is text[offsets[i]:offsets[i+1]]):
+    codepoints are decoded with numpy and looked up in SCRIPT_TABLE chunk by chunk. A span's first
+    non-LATIN character is either its own first character or the start of a run of them, so only run
+    starts are searched (searchsorted), which keeps CJK/Arabic-dense text as cheap as Latin.
+    Returns (n,) uint8 indices into SCRIPT_NAMES.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    codes = np.zeros(len(text) + 1, dtype=np.uint8)  # + a LATIN sentinel for empty spans at the end
+    runs = []
+    for lo in range(0, len(text), SCRIPT_CHUNK_CHARS):
+        cp = np.frombuffer(text[lo:lo + SCRIPT_CHUNK_CHARS].encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        chunk = codes[lo:lo + len(cp)]
+        np.take(SCRIPT_TABLE, cp, mode='clip', out=chunk)
+        hit = chunk != 0
+        hit[1:] &= chunk[:-1] == 0
+        runs.append(np.flatnonzero(hit) + lo)
+    runs = np.concatenate(runs) if runs else np.zeros(0, dtype=np.int64)
+    starts, ends = offsets[:-1], offsets[1:]
+    nxt = np.searchsorted(runs, starts)
+    first = np.where(codes[starts] != 0, starts, np.append(runs, len(text))[nxt])
+    return np.where(first < ends, codes[first], 0).astype(np.uint8)
+
 def detect_language(text):
-    # Detects script: CJK, Devanagari, Arabic, Latin, etc.
-    for ch in text:
-        code = ord(ch)
-        if 0x3040 <= code <= 0x30ff or 0x4e00 <= code <= 0x9fff:
-            return 'CJK'
-        if 0x0900 <= code <= 0x097F:
-            return 'DEVANAGARI'
-        if 0x0600 <= code <= 0x06FF:
-            return 'ARABIC'
-        if 0x0590 <= code <= 0x05FF:
-            return 'HEBREW'
-    return 'LATIN'
+    # Detects script: CJK, Devanagari, Arabic, Cyrillic, Latin, etc. (single-string span_scripts)
+    return SCRIPT_NAMES[span_scripts(text, [0, len(text)])[0]]
 
 def guess_heading_level_cluster(font_size, cluster_centers):
     # Assigns H1/H2/H3 based on cluster center proximity
@@ -50,180 +113,962 @@ def guess_heading_level_cluster(font_size, cluster_centers):
     else:
         return 'BODY'
 
-def extract_headings_from_page(page, cluster_centers, body_font_size, toc_headings=None):
-    blocks = page.get_text('dict')['blocks']
+# --- Span table: one columnar pass over the document ---
+# fitz reports sizes and coordinates as C floats, so float32 storage is lossless.
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES  # image blocks are skipped anyway
+
+class SpanTable:
+    """Columnar, per-document representation of every text span.
+
+    size (n,) float32, bold (n,) bool, bbox (n,4) float32 span box,
+    line_y (n,2) float32 top/bottom of the enclosing line, page (n,) int32,
+    offsets (n+1,) int64 into the cleaned text buffer, page_starts (pages+1,) int64.
+    """
+    def __init__(self, size, bold, bbox, line_y, page, offsets, text, num_pages):
+        self.size = size
+        self.bold = bold
+        self.bbox = bbox
+        self.line_y = line_y
+        self.page = page
+        self.offsets = offsets
+        self.text = text
+        self.num_pages = num_pages
+        self.page_starts = np.searchsorted(page, np.arange(num_pages + 1)).astype(np.int64)
+        self._scripts = None
+
+    def __len__(self):
+        return len(self.size)
+
+    def span_text(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def page_range(self, page_index):
+        return int(self.page_starts[page_index]), int(self.page_starts[page_index + 1])
+
+    def text_lengths(self):
+        return np.diff(self.offsets)
+
+    def scripts(self):
+        # (n,) uint8 script codes (SCRIPT_NAMES), computed over the whole text buffer on first use
+        if self._scripts is None:
+            self._scripts = span_scripts(self.text, self.offsets)
+        return self._scripts
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez(buf, size=self.size, bold=self.bold, bbox=self.bbox, line_y=self.line_y, page=self.page,
+                 offsets=self.offsets, text=np.frombuffer(self.text.encode('utf-8'), dtype=np.uint8),
+                 num_pages=np.int64(self.num_pages))
+        return buf.getvalue()
+
+    @classmethod
+    def from_file(cls, f):
+        with np.load(f) as data:
+            return cls(size=data['size'], bold=data['bold'], bbox=data['bbox'], line_y=data['line_y'],
+                       page=data['page'], offsets=data['offsets'], text=data['text'].tobytes().decode('utf-8'),
+                       num_pages=int(data['num_pages']))
+
+def build_span_table(doc, page_indices=None):
+    # Single get_text('dict') pass per page; everything downstream reads these columns
+    sizes, bolds, bboxes, line_ys, pages, texts = [], [], [], [], [], []
+    if page_indices is None:
+        page_indices = range(len(doc))
+    for i in page_indices:
+        for b in doc[i].get_text('dict', flags=TEXT_FLAGS)['blocks']:
+            if b['type'] != 0:
+                continue
+            for line in b['lines']:
+                line_bbox = line['bbox']
+                for span in line['spans']:
+                    sizes.append(span['size'])
+                    bolds.append(is_bold(span['font']))
+                    bboxes.append(span['bbox'])
+                    line_ys.append((line_bbox[1], line_bbox[3]))
+                    pages.append(i)
+                    texts.append(clean_text(span['text']))
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    return SpanTable(
+        size=np.array(sizes, dtype=np.float32),
+        bold=np.array(bolds, dtype=bool),
+        bbox=np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+        line_y=np.array(line_ys, dtype=np.float32).reshape(-1, 2),
+        page=np.array(pages, dtype=np.int32),
+        offsets=offsets,
+        text=''.join(texts),
+        num_pages=len(doc),
+    )
+
+def concat_span_tables(tables, num_pages):
+    # Merges per-shard tables (in page order) into one document-wide table
+    text_lengths = [len(t.text) for t in tables]
+    shifts = np.cumsum([0] + text_lengths[:-1])
+    offsets = np.concatenate([[0]] + [t.offsets[1:] + shift for t, shift in zip(tables, shifts)]).astype(np.int64)
+    return SpanTable(
+        size=np.concatenate([t.size for t in tables]),
+        bold=np.concatenate([t.bold for t in tables]),
+        bbox=np.concatenate([t.bbox for t in tables]),
+        line_y=np.concatenate([t.line_y for t in tables]),
+        page=np.concatenate([t.page for t in tables]),
+        offsets=offsets,
+        text=''.join(t.text for t in tables),
+        num_pages=num_pages,
+    )
+
+def _init_worker():
+    # One BLAS/OpenMP thread per worker process; the pool itself provides the parallelism
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+def _extract_shard(pdf_path, first_page, last_page):
+    # Each shard opens its own fitz handle; documents are not shareable across processes
+    doc = fitz.open(pdf_path)
+    try:
+        return build_span_table(doc, range(first_page, last_page))
+    finally:
+        doc.close()
+
+def build_span_table_sharded(pdf_path, num_pages, workers, shard_pages=SHARD_PAGES):
+    ranges = [(first, min(first + shard_pages, num_pages)) for first in range(0, num_pages, shard_pages)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), initializer=_init_worker) as executor:
+        tables = list(executor.map(_extract_shard, [pdf_path] * len(ranges), *zip(*ranges)))
+    return concat_span_tables(tables, num_pages)
+
+# --- Font clustering on weighted unique (size, bold, left) rows ---
+_center_cache = OrderedDict()
+
+def font_feature_histogram(spans):
+    # Documents repeat a few dozen styles, so fit on unique rows weighted by span count.
+    # Each row is packed into one uint64 key (size bits | bold in the sign bit, left bits) for a fast 1-D unique.
+    size_bits = spans.size.view(np.uint32).astype(np.uint64) | (spans.bold.astype(np.uint64) << np.uint64(31))
+    keys = (size_bits << np.uint64(32)) | np.ascontiguousarray(spans.bbox[:, 0]).view(np.uint32).astype(np.uint64)
+    keys, counts = np.unique(keys, return_counts=True)
+    size = ((keys >> np.uint64(32)) & np.uint64(0x7FFFFFFF)).astype(np.uint32).view(np.float32)
+    bold = (keys >> np.uint64(63)).astype(np.float64)
+    left = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32).view(np.float32)
+    rows = np.column_stack([size, bold, left]).astype(np.float64)
+    order = np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))  # deterministic row order for KMeans init
+    return rows[order], counts[order]
+
+def degenerate_centers(sizes, weights, n_clusters):
+    # Too few distinct sizes to cluster: sizes above the dominant (body) size become heading centers and the
+    # body size fills the remaining slots, so body text and anything smaller still rank as BODY
+    sizes = sizes.astype(np.float64)
+    body = sizes[np.argmax(weights)]
+    above = np.sort(sizes[sizes > body])[::-1][:n_clusters - 1]
+    return np.concatenate([above, np.full(n_clusters - len(above), body)])
+
+def cluster_sizes_histogram(sizes, weights, n_clusters, iterations=50):
+    # Weighted 1-D Lloyd iterations over unique font sizes, seeded at the most frequent sizes
+    if len(sizes) <= n_clusters:
+        return degenerate_centers(sizes, weights, n_clusters)
+    centers = sizes[np.sort(np.argsort(-weights, kind='stable')[:n_clusters])].astype(np.float64)
+    for _ in range(iterations):
+        labels = np.argmin(np.abs(sizes[:, None] - centers[None, :]), axis=1)
+        mass = np.bincount(labels, weights=weights, minlength=n_clusters)
+        sums = np.bincount(labels, weights=weights * sizes, minlength=n_clusters)
+        updated = np.where(mass > 0, sums / np.maximum(mass, 1e-12), centers)
+        if np.allclose(updated, centers):
+            break
+        centers = updated
+    return centers
+
+def fit_cluster_centers(rows, counts, n_clusters=KMEANS_CLUSTERS, method=CLUSTER_METHOD):
+    """
+    Font-size cluster centers from unique feature rows and their span counts. Documents with fewer
+    distinct rows than clusters keep their sizes above the body size as centers (see degenerate_centers);
+    huge style sets go to MiniBatchKMeans.
+    """
+    if len(rows) == 0:
+        return np.array([0.0])
+    if len(rows) <= n_clusters:
+        sizes, inverse = np.unique(rows[:, 0], return_inverse=True)
+        return degenerate_centers(sizes, np.bincount(inverse, weights=counts), n_clusters)
+    key = hashlib.sha1(rows.tobytes() + counts.tobytes() + f'{n_clusters}{method}'.encode()).hexdigest()
+    if key in _center_cache:
+        _center_cache.move_to_end(key)
+        return _center_cache[key]
+    if method == 'auto':
+        method = 'kmeans' if len(rows) <= KMEANS_MAX_UNIQUE else 'minibatch'
+    weights = counts.astype(np.float64)
+    if method == 'histogram':
+        sizes, inverse = np.unique(rows[:, 0], return_inverse=True)
+        size_weights = np.bincount(inverse, weights=weights)
+        centers = cluster_sizes_histogram(sizes, size_weights, n_clusters)
+    else:
+        # Imported here: sklearn is most of the startup time, and cache hits and small style sets never fit
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        if method == 'minibatch':
+            model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init='auto', batch_size=4096)
+        else:
+            model = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
+        model.fit(rows, sample_weight=weights)
+        centers = model.cluster_centers_[:, 0]
+    _center_cache[key] = centers
+    if len(_center_cache) > CENTER_CACHE_SIZE:
+        _center_cache.popitem(last=False)
+    return centers
+
+def most_common_size(spans):
+    # Same tie-break as Counter.most_common: the size seen first wins
+    if not len(spans):
+        return 0.0
+    sizes, first, counts = np.unique(spans.size, return_index=True, return_counts=True)
+    tied = np.flatnonzero(counts == counts.max())
+    return float(sizes[tied[np.argmin(first[tied])]])
+
+NUMBERED_HEADING_RE = re.compile(r'^(\d+\.|[A-Z]\.|[IVX]+\.)', re.MULTILINE)
+LEVEL_NAMES = np.array(['H1', 'H2', 'H3', 'BODY'])
+
+def assign_heading_levels(font_sizes, cluster_centers):
+    # Vectorized guess_heading_level_cluster: nearest center, ranked largest-first
+    idx = np.argmin(np.abs(np.asarray(font_sizes, dtype=np.float64)[:, None] - cluster_centers[None, :]), axis=1)
+    # Rank = centers at least as large, minus one: distinct centers rank largest-first as before, and tied
+    # centers (degenerate_centers padding) all take the lowest rank among them
+    rank = (cluster_centers[None, :] >= cluster_centers[:, None]).sum(axis=1) - 1
+    return np.minimum(rank[idx], 3)  # index into LEVEL_NAMES
+
+def span_spacing(spans, candidates):
+    # Gap between each candidate's line top and the previous candidate's line bottom on the same page;
+    # 0 for the first candidate on a page (or when the previous bottom is 0, as the old loop did)
+    tops = spans.line_y[candidates, 0].astype(np.float64)
+    bottoms = spans.line_y[candidates, 1].astype(np.float64)
+    prev_bottom = np.concatenate([[0.0], bottoms[:-1]])
+    pages = spans.page[candidates]
+    first_on_page = np.concatenate([[True], pages[1:] != pages[:-1]])
+    unset = first_on_page | (prev_bottom == 0)
+    return np.where(unset, 0.0, tops - prev_bottom)
+
+def numbered_pattern_mask(spans, candidates):
+    # One regex pass over the candidate texts joined by newlines instead of re.match per span
+    texts = [spans.span_text(i) for i in candidates.tolist()]
+    starts = np.zeros(len(texts), dtype=np.int64)
+    if len(texts) > 1:
+        np.cumsum([len(t) + 1 for t in texts[:-1]], out=starts[1:])
+    hits = np.fromiter((m.start() for m in NUMBERED_HEADING_RE.finditer('\n'.join(texts))), dtype=np.int64)
+    return np.isin(starts, hits), texts
+
+def classify_spans(spans, cluster_centers, body_font_size, toc_index=None, start=0, end=None):
+    """
+    Scores every span in [start, end) at once. Cluster level, left margin, spacing, bold and numbered
+    pattern are array operations; the TOC is only consulted for spans a TOC hit could promote, and the
+    Python loop only builds records for spans with at least 2 signals. Returns headings with a 0-based 'page'.
+    """
+    end = len(spans) if end is None else end
+    lengths = np.diff(spans.offsets[start:end + 1])
+    candidates = start + np.flatnonzero(lengths >= 2)
+    if not len(candidates):
+        return []
+    sizes = spans.size[candidates].astype(np.float64)
+    lefts = spans.bbox[candidates, 0].astype(np.float64)
+    spacing = span_spacing(spans, candidates)
+    levels = assign_heading_levels(sizes, cluster_centers)
+    is_clustered = levels < 3
+    near_left = lefts < LEFT_MARGIN_THRESHOLD
+    extra_space = spacing > body_font_size * LINE_SPACING_THRESHOLD
+    bold = spans.bold[candidates]
+    numbered, texts = numbered_pattern_mask(spans, candidates)
+    scripts = spans.scripts()
+    signals = is_clustered.astype(np.int8) + near_left + extra_space
+    toc_hits = {}
+    if toc_index:
+        # A TOC hit adds one signal, so only spans already holding one or more can reach 2
+        for k in np.flatnonzero(signals >= 1).tolist():
+            hit = toc_index.match(texts[k])
+            if hit is not None:
+                toc_hits[k] = hit
+        if toc_hits:
+            signals[list(toc_hits)] += 1
     headings = []
-    prev_bottom = 0
-    for b in blocks:
-        if b['type'] != 0:
-            continue
-        for line in b['lines']:
-            for span in line['spans']:
-                text = clean_text(span['text'])
-                if not text or len(text) < 2:
-                    continue
-                font_size = span['size']
-                font_name = span['font']
-                left = span['bbox'][0]
-                spacing = (line['bbox'][1] - prev_bottom) if prev_bottom else 0
-                prev_bottom = line['bbox'][3]
-                weight = font_size * (HEADING_BOLDNESS_WEIGHT if is_bold(font_name) else 1)
-                lang = detect_language(text)
-                explanation = []
-                # KMeans-based heading level
-                level = guess_heading_level_cluster(font_size, cluster_centers)
-                if level != 'BODY':
-                    explanation.append(f'Clustered as {level} (font size {font_size:.1f})')
-                # Visual/spacing features
-                if left < LEFT_MARGIN_THRESHOLD:
-                    explanation.append(f'Near left margin ({left:.1f}px)')
-                if spacing > body_font_size * LINE_SPACING_THRESHOLD:
-                    explanation.append(f'Extra spacing above ({spacing:.1f})')
-                # Boldness
-                if is_bold(font_name):
-                    explanation.append('Font is bold')
-                # Numbered/section patterns
-                if re.match(r'^(\d+\.|[A-Z]\.|[IVX]+\.)', text):
-                    explanation.append('Matches numbered/section pattern')
-                # TOC cross-validation
-                toc_match = False
-                if toc_headings:
-                    for toc in toc_headings:
-                        if text.lower().strip() in toc.lower().strip():
-                            toc_match = True
-                            explanation.append('Found in TOC')
-                            break
-                # Final heading decision: must have at least 2 signals (cluster+visual or TOC)
-                signals = (level != 'BODY') + (left < LEFT_MARGIN_THRESHOLD) + (spacing > body_font_size * LINE_SPACING_THRESHOLD) + toc_match
-                if signals >= 2:
-                    headings.append({
-                        'level': level,
-                        'text': text,
-                        'lang': lang,
-                        'explanation': explanation
-                    })
+    for k in np.flatnonzero(signals >= 2).tolist():
+        level = LEVEL_NAMES[levels[k]]
+        explanation = []
+        if is_clustered[k]:
+            explanation.append(f'Clustered as {level} (font size {sizes[k]:.1f})')
+        if near_left[k]:
+            explanation.append(f'Near left margin ({lefts[k]:.1f}px)')
+        if extra_space[k]:
+            explanation.append(f'Extra spacing above ({spacing[k]:.1f})')
+        if bold[k]:
+            explanation.append('Font is bold')
+        if numbered[k]:
+            explanation.append('Matches numbered/section pattern')
+        heading = {
+            'level': str(level),
+            'text': texts[k],
+            'page': int(spans.page[candidates[k]]),
+            'span': int(candidates[k]),
+            'lang': SCRIPT_NAMES[scripts[candidates[k]]],
+            'explanation': explanation
+        }
+        if k in toc_hits:
+            explanation.append('Found in TOC')
+            heading['toc_level'] = toc_hits[k][1]
+        headings.append(heading)
+    return headings
+
+def extract_headings_from_page(spans, page_index, cluster_centers, body_font_size, toc_index=None):
+    start, end = spans.page_range(page_index)
+    headings = classify_spans(spans, cluster_centers, body_font_size, toc_index, start, end)
+    for h in headings:
+        del h['page'], h['span']
     return headings
 
-def extract_title(doc):
+def extract_title(doc, spans):
     # Try metadata first
     meta = doc.metadata
     if meta and meta.get('title') and len(meta['title']) > 3:
         return clean_text(meta['title'])
     # Fallback: first large text on first page
-    page = doc[0]
-    blocks = page.get_text('dict')['blocks']
-    candidates = []
-    for b in blocks:
-        if b['type'] != 0:
-            continue
-        for line in b['lines']:
-            for span in line['spans']:
-                text = clean_text(span['text'])
-                if not text:
-                    continue
-                candidates.append((span['size'], text))
-    if candidates:
-        return max(candidates, key=lambda x: x[0])[1]
+    start, end = spans.page_range(0) if spans.num_pages else (0, 0)
+    lengths = spans.text_lengths()[start:end]
+    candidates = start + np.flatnonzero(lengths > 0)
+    if len(candidates):
+        # argmax keeps the first span among equal sizes, like max() did
+        best = candidates[np.argmax(spans.size[candidates])]
+        return spans.span_text(best)
     return ""
 
-def extract_toc(doc):
-    # Try to extract TOC from PDF outline if present
+def extract_toc_entries(doc):
+    # (level, title) pairs from the PDF outline, if present
     try:
         toc = doc.get_toc()
-        return [clean_text(item[1]) for item in toc if len(item) > 1]
+        return [(item[0], clean_text(item[1])) for item in toc if len(item) > 1]
     except Exception:
         return []
 
-def process_pdf(pdf_path):
+def extract_toc(doc):
+    # Try to extract TOC from PDF outline if present
+    return [title for _, title in extract_toc_entries(doc)]
+
+TOC_GRAM = 3  # n-gram length for the TOC substring index
+
+class TocIndex:
+    """Answers "is this span text contained in a TOC entry?" without scanning every entry.
+
+    Entries are normalized once; an n-gram posting list narrows each query to the entries sharing
+    its rarest n-gram, and shorter queries hit a table of all short substrings. The first matching
+    entry in outline order is returned, exactly like the linear scan it replaces.
+    """
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.normalized = [title.lower().strip() for _, title in self.entries]
+        self.postings = defaultdict(list)
+        self.short = {}
+        for idx, norm in enumerate(self.normalized):
+            grams = {norm[j:j + TOC_GRAM] for j in range(len(norm) - TOC_GRAM + 1)}
+            for gram in grams:
+                self.postings[gram].append(idx)
+            for n in range(TOC_GRAM):
+                for j in range(len(norm) - n + 1):
+                    self.short.setdefault(norm[j:j + n], idx)
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _find(self, query):
+        if len(query) < TOC_GRAM:
+            return self.short.get(query)
+        rarest = None
+        for j in range(len(query) - TOC_GRAM + 1):
+            posting = self.postings.get(query[j:j + TOC_GRAM])
+            if posting is None:
+                return None
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        for idx in rarest:
+            if query in self.normalized[idx]:
+                return idx
+        return None
+
+    def match(self, text):
+        # Returns (entry index, TOC level, entry title) or None
+        query = text.lower().strip()
+        if query not in self.cache:
+            self.cache[query] = self._find(query)
+        idx = self.cache[query]
+        if idx is None:
+            return None
+        level, title = self.entries[idx]
+        return idx, level, title
+
+def build_toc_index(doc):
+    return TocIndex(extract_toc_entries(doc))
+
+def extractor_config():
+    # Everything that can change an outline; part of the outline cache key
+    return {
+        'extractor_version': EXTRACTOR_VERSION,
+        'heading_min_font_size_diff': HEADING_MIN_FONT_SIZE_DIFF,
+        'heading_boldness_weight': HEADING_BOLDNESS_WEIGHT,
+        'left_margin_threshold': LEFT_MARGIN_THRESHOLD,
+        'line_spacing_threshold': LINE_SPACING_THRESHOLD,
+        'kmeans_clusters': KMEANS_CLUSTERS,
+        'kmeans_max_unique': KMEANS_MAX_UNIQUE,
+        'cluster_method': CLUSTER_METHOD,
+        'span_config': span_config(),
+        'sklearn': version('scikit-learn'),  # read from package metadata, without importing sklearn
+        'numpy': np.__version__,
+    }
+
+def span_config():
+    # Everything that can change the parsed span table; part of the span cache key
+    return {'span_table_version': SPAN_TABLE_VERSION, 'pymupdf': fitz.VersionBind, 'text_flags': TEXT_FLAGS}
+
+def load_spans(doc, pdf_path, shard_threshold=SHARD_PAGE_THRESHOLD, shard_workers=None, cache=None, content=None):
+    # Span table from the span cache, else parsed (in page shards when very large) and cached
+    if cache is not None:
+        span_key = f'{content}-{config_hash(span_config())}'
+        cached_spans = cache.get_spans(span_key)
+        if cached_spans is not None:
+            # Heuristics changed but the PDF and parser did not: skip page parsing entirely
+            return SpanTable.from_file(cached_spans)
+    shard_workers = shard_workers or os.cpu_count() or 1
+    if shard_threshold and len(doc) >= shard_threshold and shard_workers > 1:
+        # Very large document: parse page ranges in parallel, then cluster and classify globally
+        spans = build_span_table_sharded(pdf_path, len(doc), shard_workers)
+    else:
+        spans = build_span_table(doc)
+    if cache is not None:
+        cache.record_miss()
+        cache.put_spans(span_key, spans.to_bytes())
+    return spans
+
+def section_text_paths(prefix):
+    return prefix + '.txt', prefix + '.npy'
+
+def body_text(spans, start, end, paragraph_gap):
+    # Spans [start, end) of one page as text: a space between spans and lines, a newline at paragraph gaps
+    if start >= end:
+        return ''
+    gaps = spans.line_y[start + 1:end, 0] - spans.line_y[start:end - 1, 1]
+    new_line = spans.line_y[start + 1:end, 0] != spans.line_y[start:end - 1, 0]
+    seps = np.where(new_line & (gaps > paragraph_gap), '\n', ' ')
+    parts = [spans.span_text(start)]
+    for i, sep in zip(range(start + 1, end), seps.tolist()):
+        parts.append(sep)
+        parts.append(spans.span_text(i))
+    return ''.join(parts).strip()
+
+class SectionTextWriter:
+    """
+    Writes the section text sidecar for an outline as it is produced. Each heading's body is the text of
+    the spans after it up to the next heading (across pages); bodies are appended to <prefix>.txt as UTF-8
+    and <prefix>.npy holds n+1 int64 byte offsets, so outline entry i is blob[offsets[i]:offsets[i+1]].
+    Only the open body is held in memory, and both files appear atomically on close.
+    """
+    def __init__(self, prefix, body_font_size):
+        self.txt_path, self.npy_path = section_text_paths(prefix)
+        self.paragraph_gap = body_font_size * PARAGRAPH_GAP
+        self.tmp = f'{self.txt_path}.tmp-{os.getpid()}'
+        self.f = open(self.tmp, 'wb')
+        self.offsets = [0]
+        self.body = None  # text pieces of the current heading's body; None before the first heading
+
+    def _flush_body(self):
+        if self.body is not None:
+            self.offsets.append(self.offsets[-1] + self.f.write('\n'.join(p for p in self.body if p).encode('utf-8')))
+
+    def add_page(self, spans, start, end, heading_rows):
+        # heading_rows: span indices of this page's headings, in order
+        cursor = start
+        for row in heading_rows:
+            if self.body is not None:
+                self.body.append(body_text(spans, cursor, row, self.paragraph_gap))
+            self._flush_body()
+            self.body = []
+            cursor = row + 1
+        if self.body is not None:
+            self.body.append(body_text(spans, cursor, end, self.paragraph_gap))
+
+    def close(self):
+        self._flush_body()
+        self.f.close()
+        npy_tmp = f'{self.npy_path}.tmp-{os.getpid()}'
+        with open(npy_tmp, 'wb') as f:
+            np.save(f, np.array(self.offsets, dtype=np.int64))
+        os.replace(self.tmp, self.txt_path)
+        os.replace(npy_tmp, self.npy_path)
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+def outline_heading(h):
+    # classify_spans record -> outline entry with a 1-based page
+    heading = {
+        'level': h['level'],
+        'text': h['text'],
+        'page': h['page']+1,
+        'lang': h['lang'],
+        'explanation': h['explanation']
+    }
+    if 'toc_level' in h:
+        # Bookmark hierarchy level of the matched TOC entry
+        heading['toc_level'] = h['toc_level']
+    return heading
+
+def explainability_block(runtime, mem_peak, num_headings, stages=None):
+    return {
+        'heuristics': [
+            'Font size clustering (weighted KMeans over unique font styles)',
+            'Boldness and left margin for heading detection',
+            'Spacing and TOC cross-validation',
+            'Multilingual/script-aware heuristics',
+            'Numbered/section heading patterns',
+            'Batch processing, offline, CPU-only',
+            'Strict output directory: /output',
+            'Model size <200MB, runtime <10s, RAM <200MB'
+        ],
+        'compliance': {
+            'output_dir': '/output',
+            'cpu_only': True,
+            'offline': True,
+            'model_size_mb': 80,
+            'runtime_sec': round(runtime,2),
+            'mem_peak_mb': round(mem_peak,1),
+            'stage_sec': stages or {},
+            'docker_platform': 'linux/amd64',
+            'no_gpu': True
+        },
+        'signals_summary': f"{num_headings} headings detected using >2 heuristic signals each"
+    }
+
+def outline_records(result):
+    # Replays a finished outline (e.g. a cache hit) as iter_outline records
+    yield {'type': 'title', 'title': result['title']}
+    for heading in result['outline']:
+        yield dict(type='heading', **heading)
+    yield {'type': 'summary', 'headings': len(result['outline']), 'runtime_sec': result['runtime_sec'],
+           'mem_peak_mb': result['mem_peak_mb'], 'explainability_and_compliance': result['explainability_and_compliance']}
+
+def outline_from_records(records):
+    # Reassembles the process_pdf result from iter_outline records
+    result = {'title': '', 'outline': []}
+    for record in records:
+        fields = {k: v for k, v in record.items() if k != 'type'}
+        if record['type'] == 'title':
+            result['title'] = fields['title']
+        elif record['type'] == 'heading':
+            result['outline'].append(fields)
+        elif record['type'] == 'summary':
+            del fields['headings']
+            result.update(fields)
+    return result
+
+def iter_outline(pdf_path, shard_threshold=SHARD_PAGE_THRESHOLD, shard_workers=None, cache=None, stats_pages=None,
+                 section_text=None, metrics=None):
+    """
+    Streaming form of process_pdf. Yields a {'type': 'title'} record, then one {'type': 'heading'} record
+    per heading in page order, then a {'type': 'summary'} record with runtime, memory and the explainability
+    block; headings are not accumulated unless they go into the outline cache.
+    Font statistics need every span, so by default headings start once the document is parsed and the
+    outline matches process_pdf exactly. With stats_pages, statistics are fitted on the first stats_pages
+    pages and later pages are parsed, classified and released one at a time: the first heading arrives
+    early and memory stays flat, but levels on later pages may differ from the batch outline, so such
+    runs bypass the cache.
+    With section_text (a path prefix), each heading's body text also goes to a SectionTextWriter sidecar and
+    the summary names it; the outline cache is not consulted then, since bodies need the spans.
+    metrics (an instrumentation.Metrics) receives stage timings and counters; mem_peak_mb is its sampled
+    peak RSS. Without one, a private Metrics runs for the duration of the document.
+    """
+    own = metrics is None
+    if own:
+        metrics = Metrics(os.path.basename(pdf_path)).start()
+    try:
+        yield from _outline(pdf_path, shard_threshold, shard_workers, cache, stats_pages, section_text, metrics)
+    finally:
+        if own:
+            metrics.finish()
+
+def _outline(pdf_path, shard_threshold, shard_workers, cache, stats_pages, section_text, metrics):
     t0 = time.time()
-    process = psutil.Process()
-    mem0 = process.memory_info().rss / (1024*1024)
+    content = None
+    if stats_pages is not None:
+        cache = None
+    if cache is not None:
+        content = cache.content_hash(pdf_path)
+        outline_key = f'{content}-{config_hash(extractor_config())}'
+        cached = cache.get_outline(outline_key) if section_text is None else None
+        if cached is not None:
+            metrics.count('headings', len(cached['outline']))
+            yield from outline_records(cached)
+            return
     doc = fitz.open(pdf_path)
-    all_font_sizes = []
-    font_features = []
-    for page in doc:
-        for b in page.get_text('dict')['blocks']:
-            if b['type'] != 0:
-                continue
-            for line in b['lines']:
-                for span in line['spans']:
-                    all_font_sizes.append(span['size'])
-                    font_features.append([
-                        span['size'],
-                        1 if is_bold(span['font']) else 0,
-                        span['bbox'][0]  # left margin
-                    ])
-    font_features = np.array(font_features)
-    kmeans = KMeans(n_clusters=KMEANS_CLUSTERS, random_state=42, n_init='auto')
-    kmeans.fit(font_features)
-    cluster_centers = kmeans.cluster_centers_[:,0]
-    body_font_size = Counter(all_font_sizes).most_common(1)[0][0]
-    toc_headings = extract_toc(doc)
-    headings = []
-    for i, page in enumerate(doc):
-        page_headings = extract_headings_from_page(page, cluster_centers, body_font_size, toc_headings)
-        for h in page_headings:
-            headings.append({
-                'level': h['level'],
-                'text': h['text'],
-                'page': i+1,
-                'lang': h['lang'],
-                'explanation': h['explanation']
-            })
-    title = extract_title(doc)
-    t1 = time.time()
-    mem1 = process.memory_info().rss / (1024*1024)
-    runtime = t1 - t0
-    mem_peak = max(mem0, mem1)
+    writer = None
+
+    def parse_page(p):
+        with metrics.stage('parse'):
+            spans = build_span_table(doc, [p])
+        metrics.count('spans', len(spans))
+        return spans, [p]
+    try:
+        metrics.count('pages', len(doc))
+        with metrics.stage('parse'):
+            if stats_pages is None or stats_pages >= len(doc):
+                spans = load_spans(doc, pdf_path, shard_threshold, shard_workers, cache, content)
+                chunks = iter([(spans, range(len(doc)))])
+            else:
+                spans = build_span_table(doc, range(stats_pages))
+                chunks = itertools.chain([(spans, range(stats_pages))], map(parse_page, range(stats_pages, len(doc))))
+        metrics.count('spans', len(spans))
+        with metrics.stage('cluster'):
+            rows, counts = font_feature_histogram(spans)
+            cluster_centers = fit_cluster_centers(rows, counts)
+            body_font_size = most_common_size(spans)
+        metrics.count('font_styles', len(rows))
+        with metrics.stage('toc'):
+            toc_index = build_toc_index(doc)
+        with metrics.stage('title'):
+            title = extract_title(doc, spans)
+        yield {'type': 'title', 'title': title}
+        del spans
+        if section_text is not None:
+            writer = SectionTextWriter(section_text, body_font_size)
+        headings = [] if cache is not None else None
+        num_headings = 0
+        for spans, pages in chunks:
+            for p in pages:
+                start, end = spans.page_range(p)
+                t = time.perf_counter()
+                page_headings = classify_spans(spans, cluster_centers, body_font_size, toc_index, start, end)
+                metrics.add_time('classify', time.perf_counter() - t)
+                if writer is not None:
+                    t = time.perf_counter()
+                    writer.add_page(spans, start, end, [h['span'] for h in page_headings])
+                    metrics.add_time('section_text', time.perf_counter() - t)
+                for h in page_headings:
+                    heading = outline_heading(h)
+                    num_headings += 1
+                    if headings is not None:
+                        headings.append(heading)
+                    yield dict(type='heading', **heading)
+        if writer is not None:
+            with metrics.stage('section_text'):
+                writer.close()
+            writer = None
+    finally:
+        if writer is not None:
+            writer.abort()
+        doc.close()
+    metrics.count('headings', num_headings)
+    runtime = time.time() - t0
+    mem_peak = metrics.peak_rss_mb
     if runtime > 10:
         print(f"[WARN] Structure extraction runtime exceeded 10s: {runtime:.2f}s")
     if mem_peak > 200:
         print(f"[WARN] Structure extraction used >200MB RAM: {mem_peak:.1f}MB")
-    return {
-        'title': title,
-        'outline': headings,
+    summary = {
+        'type': 'summary',
+        'headings': num_headings,
         'runtime_sec': round(runtime,2),
         'mem_peak_mb': round(mem_peak,1),
-        'explainability_and_compliance': {
-            'heuristics': [
-                'Font size clustering (KMeans)',
-                'Boldness and left margin for heading detection',
-                'Spacing and TOC cross-validation',
-                'Multilingual/script-aware heuristics',
-                'Numbered/section heading patterns',
-                'Batch processing, offline, CPU-only',
-                'Strict output directory: /output',
-                'Model size <200MB, runtime <10s, RAM <200MB'
-            ],
-            'compliance': {
-                'output_dir': '/output',
-                'cpu_only': True,
-                'offline': True,
-                'model_size_mb': 80,
-                'runtime_sec': round(runtime,2),
-                'mem_peak_mb': round(mem_peak,1),
-                'docker_platform': 'linux/amd64',
-                'no_gpu': True
-            },
-            'signals_summary': f"{len(headings)} headings detected using >2 heuristic signals each"
-        }
+        'explainability_and_compliance': explainability_block(runtime, mem_peak, num_headings, metrics.stage_seconds())
     }
+    if headings is not None:
+        result = {'title': title, 'outline': headings}
+        result.update((k, v) for k, v in summary.items() if k not in ('type', 'headings'))
+        cache.put_outline(outline_key, result)
+    if section_text is not None:
+        # Relative to the outline JSON, which Round 1B reads from the same directory
+        summary['section_text'] = os.path.basename(section_text)
+    yield summary
+
+def process_pdf(pdf_path, shard_threshold=SHARD_PAGE_THRESHOLD, shard_workers=None, cache=None, section_text=None,
+                metrics=None):
+    return outline_from_records(iter_outline(pdf_path, shard_threshold, shard_workers, cache, section_text=section_text,
+                                             metrics=metrics))
+
+class DocumentTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise DocumentTimeout()
+
+_caches = {}
+
+def get_cache(cache_dir, max_mb=DEFAULT_CACHE_MAX_MB):
+    # One OutlineCache per directory per process (pool workers each build their own)
+    if not cache_dir:
+        return None
+    if cache_dir not in _caches:
+        _caches[cache_dir] = OutlineCache(cache_dir, max_bytes=int(max_mb * 1024 * 1024))
+    return _caches[cache_dir]
+
+def _cache_status(cache, before):
+    if cache is None:
+        return None
+    for status in ('outline_hits', 'span_hits', 'misses'):
+        if cache.stats[status] > before.get(status, 0):
+            return status
+    return None
+
+def write_ndjson(records, out_path):
+    # One JSON record per line, flushed as it is produced so readers can tail the file
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+
+def end_ndjson_with_error(out_path, error):
+    # A failed document's stream ends with an error record instead of just stopping, so a reader can tell
+    # failure from a run still in progress; a record cut off mid-line (killed worker) is dropped first
+    with open(out_path, 'ab+') as f:
+        f.seek(0)
+        data = f.read()
+        f.truncate(data.rfind(b'\n') + 1)
+        f.seek(0, os.SEEK_END)
+        f.write((json.dumps({'type': 'error', 'error': error}, ensure_ascii=False) + '\n').encode('utf-8'))
+
+def extract_to_file(pdf_path, out_path, timeout=None, shard_threshold=SHARD_PAGE_THRESHOLD, shard_workers=None,
+                    cache_dir=None, cache_max_mb=DEFAULT_CACHE_MAX_MB, stream=False, stats_pages=None, section_text=False,
+                    profile_dir=None):
+    # Runs one document with failure isolation; returns (pdf_path, error or None, latency_sec, cache status,
+    # metrics dict). stream writes iter_outline records to out_path as NDJSON instead of one JSON document at the end.
+    # section_text also writes the <name>.sections.txt/.npy body sidecar next to out_path.
+    # profile_dir dumps a cProfile of the document to <profile_dir>/<name>.prof.
+    use_alarm = bool(timeout) and hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+    cache = get_cache(cache_dir, cache_max_mb)
+    before = dict(cache.stats) if cache else {}
+    prefix = os.path.splitext(out_path)[0] + SECTION_TEXT_SUFFIX if section_text else None
+    name = os.path.basename(pdf_path)
+    profile_path = os.path.join(profile_dir, os.path.splitext(name)[0] + '.prof') if profile_dir else None
+    metrics = Metrics(name, profile_path=profile_path).start()
+    t0 = time.time()
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            if stream:
+                write_ndjson(iter_outline(pdf_path, shard_threshold, shard_workers, cache, stats_pages, prefix, metrics),
+                             out_path)
+            else:
+                result = process_pdf(pdf_path, shard_threshold, shard_workers, cache, prefix, metrics)
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        if not stream:
+            with metrics.stage('serialize'):
+                with open(out_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)
+        error = None
+    except DocumentTimeout:
+        error = f'timed out after {timeout}s'
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    if error and stream:
+        end_ndjson_with_error(out_path, error)
+    status = _cache_status(cache, before)
+    if status:
+        metrics.count(status)
+    if error:
+        metrics.count('failures')
+    return pdf_path, error, time.time() - t0, status, metrics.finish().to_dict()
 
-def process_directory(input_dir, output_dir):
+def _kill_workers(executor):
+    # The in-worker SIGALRM cannot interrupt C code; terminating the processes breaks the pool, so every
+    # other in-flight future fails with BrokenProcessPool
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+
+def _worker_lost(job, error, elapsed=float('nan')):
+    # Result for a document whose worker died or was killed; that worker could not end its own stream
+    if job[1].endswith('.ndjson'):
+        end_ndjson_with_error(job[1], error)
+    return job[0], error, elapsed, None, None
+
+def _timed_out(job, timeout, elapsed):
+    return _worker_lost(job, f'timed out after {timeout}s (worker killed)', elapsed)
+
+def _drain_pool(jobs, workers, options, max_in_flight, results):
+    # Returns None once every job has run, or the in-flight jobs lost when a worker process died or was killed
+    timeout = options[0]
+    pending = {}
+    started = {}  # future -> monotonic time its document reached a worker (at most one per worker)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        while True:
+            while len(pending) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                try:
+                    pending[executor.submit(extract_to_file, job[0], job[1], *options)] = job
+                except BrokenProcessPool:
+                    return [job] + list(pending.values())
+            if not pending:
+                return None
+            if timeout:
+                # Futures in submission order; the executor's call queue can hold one more than there are workers
+                now = time.monotonic()
+                for fut in pending:
+                    if len(started) >= workers:
+                        break
+                    if fut not in started and fut.running():
+                        started[fut] = now
+                limit = timeout + POOL_TIMEOUT_GRACE_SEC
+                next_deadline = min((t + limit for t in started.values()), default=now + limit)
+                done, _ = wait(pending, timeout=max(0.05, min(next_deadline - now, 1.0)), return_when=FIRST_COMPLETED)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                job = pending.pop(fut)
+                started.pop(fut, None)
+                try:
+                    results.append(fut.result())
+                except BrokenProcessPool:
+                    return [job] + list(pending.values())
+            if timeout:
+                now = time.monotonic()
+                expired = [fut for fut, t in started.items() if now - t > timeout + POOL_TIMEOUT_GRACE_SEC]
+                if expired:
+                    for fut in expired:
+                        results.append(_timed_out(pending.pop(fut), timeout, now - started.pop(fut)))
+                    _kill_workers(executor)
+                    return list(pending.values())
+
+def _run_isolated(job, options):
+    timeout = options[0]
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_worker) as executor:
+        t0 = time.monotonic()
+        fut = executor.submit(extract_to_file, job[0], job[1], *options)
+        try:
+            return fut.result(timeout=timeout + POOL_TIMEOUT_GRACE_SEC if timeout else None)
+        except BrokenProcessPool:
+            return _worker_lost(job, 'worker process crashed')
+        except FutureTimeout:
+            _kill_workers(executor)
+            return _timed_out(job, timeout, time.monotonic() - t0)
+
+def _run_pool(jobs, workers, options, max_in_flight):
+    # Bounded in-flight submission so only max_in_flight documents are queued or loaded at once
+    timeout, shard_threshold, shard_workers, *rest = options
+    # Sharded documents share the CPUs with the other pool workers instead of each starting cpu_count processes
+    options = (timeout, shard_threshold, shard_workers or max(1, (os.cpu_count() or 1) // workers), *rest)
+    results = []
+    jobs = iter(jobs)
+    while True:
+        suspects = _drain_pool(jobs, workers, options, max_in_flight, results)
+        if suspects is None:
+            return results
+        # A worker died hard (e.g. segfault on a corrupt PDF) or was killed past its deadline: rerun the other
+        # in-flight documents one by one
+        for job in suspects:
+            results.append(_run_isolated(job, options))
+
+def summarize_run(results, wall_sec):
+    latencies = np.array([lat for _, err, lat, _, _ in results if err is None])
+    failed = [(path, err) for path, err, _, _, _ in results if err is not None]
+    cache_counts = Counter(status for _, _, _, status, _ in results if status)
+    runs = [run for *_, run in results if run]
+    summary = {
+        'documents': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'failures': [{'file': os.path.basename(path), 'error': err} for path, err in failed],
+        'wall_sec': round(wall_sec, 2),
+        'docs_per_sec': round(len(results) / wall_sec, 2) if wall_sec > 0 else 0.0,
+        'p50_latency_sec': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+        'p95_latency_sec': round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+    }
+    if cache_counts:
+        lookups = sum(cache_counts.values())
+        summary['cache'] = {
+            'outline_hits': cache_counts['outline_hits'],
+            'span_hits': cache_counts['span_hits'],
+            'misses': cache_counts['misses'],
+            'hit_rate': round((lookups - cache_counts['misses']) / lookups, 3),
+        }
+    if runs:
+        total = merge_runs(runs)
+        summary['stage_sec'] = {stage: e['seconds'] for stage, e in total['stages'].items()}
+        summary['peak_rss_mb'] = total['peak_rss_mb']
+    return summary
+
+def process_directory(input_dir, output_dir, workers=1, timeout=None, max_in_flight=None,
+                      shard_threshold=SHARD_PAGE_THRESHOLD, shard_workers=None,
+                      cache_dir=None, cache_max_mb=DEFAULT_CACHE_MAX_MB, stream=False, stats_pages=None,
+                      section_text=False, metrics_path=None, profile_dir=None):
+    """
+    Processes every PDF in input_dir. workers > 1 spreads documents over a process pool with at most
+    max_in_flight (default 2*workers) outstanding; each document gets its own timeout and a failure
+    in one PDF is recorded in the summary instead of aborting the batch. Documents with at least
+    shard_threshold pages are additionally parsed in parallel page shards (0 disables sharding), with
+    shard_workers processes (default: the CPU count, divided among the pool workers).
+    With cache_dir set, unchanged PDFs are served from the content-addressed outline cache.
+    stream writes <name>.ndjson records page by page instead of <name>.json (see iter_outline).
+    section_text also writes each document's section body sidecar (see SectionTextWriter).
+    metrics_path receives every document's stage timings, counters and sampled peak RSS (JSON, or Prometheus
+    text for .prom/.txt); profile_dir gets one cProfile dump per document.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    jobs = []
     for fname in os.listdir(input_dir):
         if not fname.lower().endswith('.pdf'):
             continue
         pdf_path = os.path.join(input_dir, fname)
-        result = process_pdf(pdf_path)
-        out_path = os.path.join(output_dir, fname.replace('.pdf', '.json'))
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        out_path = os.path.join(output_dir, fname.replace('.pdf', '.ndjson' if stream else '.json'))
+        jobs.append((pdf_path, out_path))
+    options = (timeout, shard_threshold, shard_workers, cache_dir, cache_max_mb, stream, stats_pages, section_text,
+               profile_dir)
+    t0 = time.time()
+    if workers > 1:
+        results = _run_pool(jobs, workers, options, max_in_flight or 2 * workers)
+    else:
+        results = [extract_to_file(pdf_path, out_path, *options) for pdf_path, out_path in jobs]
+    summary = summarize_run(results, time.time() - t0)
+    for failure in summary['failures']:
+        print(f"[ERROR] {failure['file']}: {failure['error']}")
+    p50, p95 = ('n/a' if sec is None else f'{sec}s' for sec in (summary['p50_latency_sec'], summary['p95_latency_sec']))
+    print(f"[INFO] {summary['succeeded']}/{summary['documents']} documents in {summary['wall_sec']}s "
+          f"({summary['docs_per_sec']} docs/s, p50 {p50}, p95 {p95})")
+    if 'cache' in summary:
+        c = summary['cache']
+        print(f"[INFO] cache: {c['outline_hits']} outline hits, {c['span_hits']} span hits, "
+              f"{c['misses']} misses (hit rate {c['hit_rate']})")
+    if summary.get('stage_sec'):
+        stages = ', '.join(f'{stage} {sec:.2f}s' for stage, sec in summary['stage_sec'].items())
+        print(f"[INFO] stages: {stages}; peak RSS {summary['peak_rss_mb']}MB")
+    if metrics_path:
+        write_metrics(metrics_path, [run for *_, run in results if run])
+        print(f"[INFO] Metrics written to {metrics_path}")
+    return summary
+
+def add_arguments(parser, io=True):
+    # Round 1A options, shared with cli.py (extract, and pipeline with io=False)
+    if io:
+        parser.add_argument('--input', default='/app/input', help='Input directory of PDFs')
+        parser.add_argument('--output', default='/app/output', help='Output directory for JSONs')
+        parser.add_argument('--workers', type=int, default=1, help='Process pool size for multi-document batches')
+        parser.add_argument('--timeout', type=float, default=None, help='Per-document timeout in seconds')
+        parser.add_argument('--max-in-flight', type=int, default=None, help='Max queued documents (default 2*workers)')
+    parser.add_argument('--shard-threshold', type=int, default=SHARD_PAGE_THRESHOLD,
+                        help='Parse documents with at least this many pages in parallel page shards (0 disables)')
+    parser.add_argument('--shard-workers', type=int, default=None, help='Processes per sharded document (default: CPU count / --workers)')
+    parser.add_argument('--cache-dir', default=None, help='Directory for the content-addressed outline cache (off if unset)')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_MB, help='Outline cache size limit in MB')
+    if io:
+        parser.add_argument('--stream', action='store_true', help='Write NDJSON records page by page instead of one JSON per PDF')
+        parser.add_argument('--stream-stats-pages', type=int, default=None,
+                            help='With --stream, fit font statistics on the first N pages so headings start early (approximate)')
+        parser.add_argument('--metrics', default=None, help='Write per-document stage metrics (JSON, or Prometheus text for .prom)')
+        parser.add_argument('--profile-dir', default=None, help='Dump a cProfile per document into this directory')
+        parser.add_argument('--section-text', action='store_true',
+                            help='Also write <name>.sections.txt/.npy with each heading\'s body text for Round 1B')
+    return parser
+
+def main(args):
+    summary = process_directory(args.input, args.output, workers=args.workers,
+                                timeout=args.timeout, max_in_flight=args.max_in_flight,
+                                shard_threshold=args.shard_threshold, shard_workers=args.shard_workers,
+                                cache_dir=args.cache_dir, cache_max_mb=args.cache_max_mb,
+                                stream=args.stream, stats_pages=args.stream_stats_pages,
+                                section_text=args.section_text, metrics_path=args.metrics,
+                                profile_dir=args.profile_dir)
+    return 1 if summary['failed'] else 0
 
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--input', default='/app/input', help='Input directory of PDFs')
-    parser.add_argument('--output', default='/app/output', help='Output directory for JSONs')
-    args = parser.parse_args()
-    process_directory(args.input, args.output)
+    raise SystemExit(main(add_arguments(argparse.ArgumentParser()).parse_args()))
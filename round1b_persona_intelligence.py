@@ -1,17 +1,68 @@
 import os
+import re
+import mmap
 import json
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
+from embedding_cache import EmbeddingStore, DEFAULT_DTYPE
+from section_index import SectionIndex
+from onnx_embedder import OnnxEmbedder, export_onnx, is_exported
+from instrumentation import Metrics, write_metrics
 
 # Use a compact, fast, and memory-efficient model (<80MB on disk, <200MB RAM)
 MODEL_NAME = "all-MiniLM-L6-v2"  # ~80MB, multilingual, fast, CPU-friendly
 
-# Load model at module level for efficiency
-def load_model(model_dir=None):
-    if model_dir:
-        return SentenceTransformer(model_dir)
-    return SentenceTransformer(MODEL_NAME)
+ENCODE_BATCH_SIZE = 64  # texts per forward pass in the corpus-wide embedding pass
+
+# --- Embedding backend config ---
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = 'torch'
+ONNX_DIR = 'onnx_models'  # exported graphs, one folder per model
+
+# --- Summarizer config ---
+TEXTRANK_MIN_SIM = 0.1  # sentence pairs less similar than this get no edge
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_TOL = 1e-6  # per-sentence convergence tolerance (same as networkx)
+TEXTRANK_MAX_ITER = 100
+TEXTRANK_BLOCK = 1024  # sentence rows per similarity block, so no dense n x n matrix is kept
+SUMMARY_CACHE_SIZE = 4096  # memoized summaries, by text hash
+
+# Loaded once per process and reused by every process_persona call
+_models = {}
+
+def default_onnx_dir(source):
+    return os.path.join(ONNX_DIR, os.path.basename(os.path.normpath(source)))
+
+def embedding_model_name(model_dir=None, backend=DEFAULT_BACKEND):
+    # Embedding cache and section index namespace: int8 vectors must not mix with torch ones
+    source = model_dir or MODEL_NAME
+    return source if backend == 'torch' else f'{source}:{backend}'
+
+def load_model(model_dir=None, backend=DEFAULT_BACKEND, onnx_dir=None):
+    """
+    torch: SentenceTransformer (imported here, so onnx runs never load torch).
+    onnx / onnx-int8: OnnxEmbedder over the graph exported to onnx_dir (default onnx_models/<model>),
+    exported on first use if missing.
+    """
+    source = model_dir or MODEL_NAME
+    key = (source, backend)
+    if key not in _models:
+        if backend == 'torch':
+            from sentence_transformers import SentenceTransformer
+            _models[key] = SentenceTransformer(source)
+        elif backend in BACKENDS:
+            onnx_dir = onnx_dir or default_onnx_dir(source)
+            quantized = backend == 'onnx-int8'
+            if not is_exported(onnx_dir, quantized):
+                print(f"[INFO] Exporting {source} to ONNX in {onnx_dir} (one-time)")
+                export_onnx(source, onnx_dir)
+            _models[key] = OnnxEmbedder(onnx_dir, quantized=quantized)
+        else:
+            raise ValueError(f'Unknown embedding backend: {backend}')
+    return _models[key]
 
 def embed_text(model, text, batch_size=32):
     # Efficient batched embedding for memory and speed
@@ -19,118 +70,617 @@ def embed_text(model, text, batch_size=32):
         return model.encode(text, show_progress_bar=False, batch_size=batch_size)
     return model.encode([text], show_progress_bar=False, batch_size=batch_size)[0]
 
-def rank_sections(sections, query_vec, model, batch_size=32):
-    texts = [s['text'] for s in sections]
-    section_vecs = embed_text(model, texts, batch_size=batch_size)
+class EmbeddingTable:
+    """Deduplicated texts embedded in one pass; rows are looked up by text.
+    With a store, cached vectors are reused and only new texts are encoded (then appended)."""
+    def __init__(self, model, texts, batch_size=ENCODE_BATCH_SIZE, store=None):
+        unique = list(dict.fromkeys(texts))
+        # Longest first so each batch pads to similar lengths (encode also sorts within a call)
+        unique.sort(key=len, reverse=True)
+        self.index = {t: i for i, t in enumerate(unique)}
+        self.requested = len(texts)
+        self.encoded = 0
+        self.encode_sec = 0.0
+        if not unique:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+            return
+        if store is not None:
+            cached, found, missing = store.get(unique)
+        else:
+            cached, found, missing = None, [], list(range(len(unique)))
+        fresh = None
+        if missing:
+            t0 = time.time()
+            fresh = np.asarray(embed_text(model, [unique[i] for i in missing], batch_size=batch_size))
+            self.encode_sec = time.time() - t0
+            self.encoded = len(missing)
+            if store is not None:
+                store.put([unique[i] for i in missing], fresh)
+        dim = fresh.shape[1] if fresh is not None else cached.shape[1]
+        self.vectors = np.empty((len(unique), dim), dtype=np.float32)
+        if found:
+            self.vectors[found] = cached
+        if missing:
+            self.vectors[missing] = fresh
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, texts):
+        return self.vectors[[self.index[t] for t in texts]]
+
+def cosine_similarity(a, b):
+    # sklearn.metrics.pairwise.cosine_similarity for dense rows, without importing sklearn (~0.7s)
+    a, b = np.asarray(a), np.asarray(b)
+    dtype = np.float32 if a.dtype == np.float32 and b.dtype == np.float32 else np.float64
+    a, b = a.astype(dtype, copy=False), b.astype(dtype, copy=False)
+    a_norm = np.sqrt(np.einsum('ij,ij->i', a, a))
+    b_norm = np.sqrt(np.einsum('ij,ij->i', b, b))
+    a_norm[a_norm < 10 * np.finfo(dtype).eps] = 1.0
+    b_norm[b_norm < 10 * np.finfo(dtype).eps] = 1.0
+    return (a / a_norm[:, None]) @ (b / b_norm[:, None]).T
+
+def split_paragraphs(text):
+    return [p.strip() for p in re.split(r'[\n\.!?]', text) if p.strip()]
+
+def rank_sections(sections, query_vec, model, batch_size=32, section_vecs=None):
+    if not sections:
+        return []
+    if section_vecs is None:
+        texts = [s['text'] for s in sections]
+        section_vecs = embed_text(model, texts, batch_size=batch_size)
     sims = cosine_similarity([query_vec], section_vecs)[0]
-    ranked = sorted(zip(sections, sims), key=lambda x: -x[1])
-    return ranked
-
-def textrank_summarize(text, top_n=2):
-    # Simple extractive summarization using TextRank (networkx)
-    import networkx as nx
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
-    sentences = [s.strip() for s in re.split(r'[\n\.!?]', text) if len(s.strip()) > 10]
+    return order_by_similarity(sections, sims)
+
+def sentence_graph(vecs, min_sim=TEXTRANK_MIN_SIM):
+    # Sparse cosine-similarity graph: self-loops and edges below min_sim are dropped
+    from scipy import sparse
+    n = vecs.shape[0]
+    if sparse.issparse(vecs):
+        # TF-IDF rows are already L2-normalized and mostly disjoint, so the product stays sparse
+        graph = (vecs @ vecs.T).tocsr()
+        graph.setdiag(0)
+        graph.data[graph.data < min_sim] = 0
+        graph.eliminate_zeros()
+        return graph
+    vecs = np.asarray(vecs, dtype=np.float32)
+    vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    rows, cols, vals = [], [], []
+    for start in range(0, n, TEXTRANK_BLOCK):
+        block = vecs[start:start + TEXTRANK_BLOCK] @ vecs.T
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = 0
+        r, c = np.nonzero(block >= min_sim)
+        rows.append(r + start)
+        cols.append(c)
+        vals.append(block[r, c])
+    return sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+def pagerank(graph, damping=TEXTRANK_DAMPING, tol=TEXTRANK_TOL, max_iter=TEXTRANK_MAX_ITER):
+    # Weighted PageRank by power iteration; dangling sentences spread their rank uniformly
+    from scipy import sparse
+    n = graph.shape[0]
+    out = np.asarray(graph.sum(axis=1)).ravel()
+    dangling = out == 0
+    transition = (sparse.diags(np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, out))) @ graph).T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        new = damping * (transition @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+        if np.abs(new - rank).sum() < n * tol:
+            return new
+        rank = new
+    return rank
+
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()  # the web app ranks persona jobs on several threads
+
+def textrank_summarize(text, top_n=2, para_vecs=None):
+    """
+    Extractive TextRank summary. para_vecs (rows aligned with split_paragraphs(text), as already
+    embedded for highlights) become the sentence graph; without them it falls back to TF-IDF.
+    Summaries are memoized by text hash, so a section shared by many queries is ranked once.
+    """
+    key = (hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest(), top_n, para_vecs is None)
+    with _summaries_lock:
+        cached = _summaries.get(key)
+        if cached is not None:
+            _summaries.move_to_end(key)
+            return list(cached)
+    paras = split_paragraphs(text)
+    keep = [i for i, p in enumerate(paras) if len(p) > 10]
+    sentences = [paras[i] for i in keep]
     if len(sentences) <= top_n:
-        return sentences
-    tfidf = TfidfVectorizer().fit_transform(sentences)
-    sim_matrix = cosine_similarity(tfidf)
-    nx_graph = nx.from_numpy_array(sim_matrix)
-    scores = nx.pagerank(nx_graph)
-    ranked = sorted(((scores[i], s) for i, s in enumerate(sentences)), reverse=True)
-    return [s for _, s in ranked[:top_n]]
-
-def analyze_subsections(text, query_vec, model, top_n=3, batch_size=32):
+        summary = sentences
+    else:
+        if para_vecs is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer  # fallback only; sklearn is slow to import
+            vecs = TfidfVectorizer().fit_transform(sentences)
+        else:
+            vecs = np.asarray(para_vecs)[keep]
+        scores = pagerank(sentence_graph(vecs))
+        ranked = sorted(zip(scores.tolist(), sentences), reverse=True)
+        summary = [s for _, s in ranked[:top_n]]
+    # Ranked outside the lock; two threads summarizing the same text store equal results
+    with _summaries_lock:
+        _summaries[key] = summary
+        if len(_summaries) > SUMMARY_CACHE_SIZE:
+            _summaries.popitem(last=False)
+    return list(summary)
+
+def analyze_subsections(text, query_vec, model, top_n=3, batch_size=32, embeddings=None):
     # Split into paragraphs/sentences
-    import re
-    paras = [p.strip() for p in re.split(r'[\n\.!?]', text) if p.strip()]
-    para_vecs = embed_text(model, paras, batch_size=batch_size)
+    paras = split_paragraphs(text)
+    if not paras:
+        return [], []
+    para_vecs = embeddings.lookup(paras) if embeddings is not None else embed_text(model, paras, batch_size=batch_size)
     sims = cosine_similarity([query_vec], para_vecs)[0]
     ranked = sorted(zip(paras, sims), key=lambda x: -x[1])
     highlights = [{"text": p, "similarity": float(s), "explanation": f"Cosine similarity to persona/job: {s:.3f}"} for p, s in ranked[:top_n]]
-    summary = textrank_summarize(text, top_n=2)
+    summary = textrank_summarize(text, top_n=2, para_vecs=para_vecs)
     return highlights, summary
 
-def process_persona(input_dir, output_dir, persona, job, batch_size=32):
+def outline_files(input_dir):
+    # Round 1A JSONs, skipping our own outputs when input and output share a directory
+    return [fname for fname in os.listdir(input_dir)
+            if fname.lower().endswith('.json') and not fname.endswith('_challenge1b_output.json')]
+
+def load_outlines(input_dir):
+    docs = []
+    for fname in outline_files(input_dir):
+        with open(os.path.join(input_dir, fname), encoding='utf-8') as f:
+            docs.append((fname, json.load(f)))
+    return docs
+
+class SectionText:
     """
-    Uses all-MiniLM-L6-v2 (~80MB) for embedding. Batches all encode calls for memory/runtime efficiency.
-    Ensures total runtime <10s for 50-page docs (typical). Warns if exceeded.
+    Lazy reader for a Round 1A section text sidecar (<prefix>.txt body blob, <prefix>.npy byte offsets).
+    Both are memory-mapped, so only the bodies that are asked for are read from disk and decoded.
     """
-    import time
-    t0 = time.time()
-    model = load_model()
-    query = persona + " " + job
-    query_vec = embed_text(model, query, batch_size=batch_size)
-    for fname in os.listdir(input_dir):
-        if not fname.lower().endswith('.json'):
+    def __init__(self, prefix, outline):
+        self.offsets = np.load(prefix + '.npy', mmap_mode='r')
+        with open(prefix + '.txt', 'rb') as f:
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        self.position = {id(s): i for i, s in enumerate(outline)}
+
+    def text(self, section):
+        # The section's body, or its heading when it has none
+        i = self.position.get(id(section))
+        if i is None:
+            return section['text']
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode('utf-8') or section['text']
+
+def open_section_text(input_dir, doc):
+    # SectionText for an outline written by round1a --section-text, else None
+    name = doc.get('section_text')
+    if not name:
+        return None
+    outline = doc.get('outline', [])
+    try:
+        reader = SectionText(os.path.join(input_dir, name), outline)
+    except (FileNotFoundError, ValueError):
+        print(f"[WARN] Section text {name} is missing or unreadable; using headings")
+        return None
+    if len(reader.offsets) != len(outline) + 1:
+        print(f"[WARN] Section text {name} does not match its outline; using headings")
+        return None
+    return reader
+
+def outline_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def update_section_index(index, input_dir, docs, embeddings, signatures=None):
+    """
+    Syncs a SectionIndex with the outlines in input_dir: documents that are new or changed since they
+    were indexed are (re)added with vectors from the embeddings table, deleted ones are dropped.
+    signatures ({fname: signature}) replaces the outline file stats for documents that are not on disk.
+    Returns the number of documents (re)indexed.
+    """
+    current = signatures if signatures is not None else {
+        fname: outline_signature(os.path.join(input_dir, fname)) for fname, _ in docs}
+    for source in list(index.sources):
+        if source not in current:
+            index.remove(source)
+    changed = 0
+    for fname, doc in docs:
+        if index.sources.get(fname) == current[fname]:
             continue
-        with open(os.path.join(input_dir, fname), encoding='utf-8') as f:
-            doc = json.load(f)
+        if fname in index.sources:
+            index.remove(fname)
         sections = doc.get('outline', [])
-        ranked_sections = rank_sections(sections, query_vec, model, batch_size=batch_size)
-        top_sections = [s for s, _ in ranked_sections[:3]]
-        output = {
-            "Metadata": {
-                "source_file": fname,
-                "persona": persona,
-                "job_to_be_done": job
-            },
-            "Extracted Sections": [
-                {
-                    "level": s['level'],
-                    "text": s['text'],
-                    "page": s['page'],
-                    "importance_rank": int(i+1),
-                    "similarity": float(sim),
-                    "explanation": f"Cosine similarity to persona/job: {sim:.3f}"
-                } for i, (s, sim) in enumerate(ranked_sections)
-            ],
-            "Sub-section Analysis": []
-        }
-        # Fine-grained analysis for top N
-        for s in top_sections:
-            highlights, summary = analyze_subsections(s['text'], query_vec, model, batch_size=batch_size)
-            output["Sub-section Analysis"].append({
-                "section": s['text'],
-                "highlights": highlights,
-                "summary": summary
-            })
+        index.add(fname, sections, embeddings.lookup([s['text'] for s in sections]) if sections else None,
+                  signature=current[fname])
+        changed += 1
+    return changed
+
+def corpus_top_sections(index, query_vec, k, mode='auto'):
+    return [
+        {
+            "source_file": s['source_file'],
+            "level": s['level'],
+            "text": s['text'],
+            "page": s['page'],
+            "corpus_rank": i + 1,
+            "similarity": sim,
+            "explanation": f"Cosine similarity to persona/job: {sim:.3f}"
+        } for i, (sim, s) in enumerate(index.search(query_vec, k, mode=mode))
+    ]
+
+_stores = {}
+
+def get_embedding_store(cache_dir, model_name=MODEL_NAME, dtype=DEFAULT_DTYPE, max_rows=None):
+    # One store per (directory, model) per process
+    if not cache_dir:
+        return None
+    key = (cache_dir, model_name)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(cache_dir, model_name, dtype=dtype, max_rows=max_rows)
+    return _stores[key]
+
+def section_embeddings(docs, queries, model, batch_size=ENCODE_BATCH_SIZE, store=None):
+    # Phase 1 table: the query texts plus every section heading of every document
+    section_texts = [s['text'] for _, doc in docs for s in doc.get('outline', [])]
+    return EmbeddingTable(model, list(queries) + section_texts, batch_size=batch_size, store=store)
+
+def record_table(metrics, table, batch_size):
+    # Encode counters for one EmbeddingTable pass
+    metrics.count('texts_requested', table.requested)
+    metrics.count('texts_unique', len(table))
+    if table.encoded:
+        metrics.count('texts_encoded', table.encoded)
+        metrics.count('encode_calls')
+        metrics.count('encode_batches', -(-table.encoded // batch_size))
+        metrics.observe('encode_call_texts', table.encoded)
+
+def query_text(persona, job):
+    return persona + " " + job
+
+def order_by_similarity(sections, sims):
+    # Stable, so equal scores keep outline order like sorted() did
+    order = np.argsort(-sims, kind='stable')
+    return [(sections[i], sims[i]) for i in order]
+
+def rank_queries(docs, queries, model, batch_size=ENCODE_BATCH_SIZE, store=None, sections_table=None, bodies=None,
+                 metrics=None):
+    """
+    Ranks (fname, outline JSON) pairs for every (persona, job) in queries. Two phases: every section heading
+    across all documents (plus every query) is deduplicated and encoded in one pass, and one similarity
+    matrix (queries x all sections) scores everything at once; then the sub-section texts of every query's
+    top sections in every document are encoded in a second pass. Ranking per document only slices and looks up.
+    With an EmbeddingStore, texts embedded by earlier runs are read from disk instead of re-encoded.
+    sections_table may pass in an already built section_embeddings table. bodies (aligned with docs, see
+    open_section_text) lets sub-section analysis read each top section's body instead of its heading.
+    metrics (an instrumentation.Metrics) receives embed/rank/summarize timings and encode counters.
+    Returns one [(fname, output dict)] list per query.
+    """
+    metrics = metrics or Metrics('rank_queries', sample_rss=False)
+    def subsection_text(d, s):
+        return bodies[d].text(s) if bodies and bodies[d] is not None else s['text']
+
+    texts = [query_text(persona, job) for persona, job in queries]
+    # Phase 1: one embedding pass over the queries and every section of every document
+    if sections_table is None:
+        with metrics.stage('embed'):
+            sections_table = section_embeddings(docs, texts, model, batch_size=batch_size, store=store)
+        record_table(metrics, sections_table, batch_size)
+    with metrics.stage('rank'):
+        query_vecs = sections_table.lookup(texts)
+        all_sections = [s for _, doc in docs for s in doc.get('outline', [])]
+        if all_sections:
+            sims = cosine_similarity(query_vecs, sections_table.lookup([s['text'] for s in all_sections]))
+        else:
+            sims = np.zeros((len(queries), 0))
+        bounds = np.cumsum([0] + [len(doc.get('outline', [])) for _, doc in docs])
+        ranked = [[(fname, order_by_similarity(doc.get('outline', []), row[bounds[d]:bounds[d + 1]]))
+                   for d, (fname, doc) in enumerate(docs)] for row in sims]
+    metrics.count('sections_ranked', len(all_sections) * len(queries))
+    # Phase 2: one pass over the sub-section texts of every query's top sections in every document
+    with metrics.stage('section_text'):
+        top_texts = [p for ranked_docs in ranked for d, (_, sections) in enumerate(ranked_docs) for s, _ in sections[:3]
+                     for p in split_paragraphs(subsection_text(d, s))]
+    with metrics.stage('embed'):
+        paras_table = EmbeddingTable(model, top_texts, batch_size=batch_size, store=store)
+    record_table(metrics, paras_table, batch_size)
+    results = []
+    t0 = time.perf_counter()
+    for (persona, job), query_vec, ranked_docs in zip(queries, query_vecs, ranked):
+        outputs = []
+        for d, (fname, ranked_sections) in enumerate(ranked_docs):
+            top_sections = [s for s, _ in ranked_sections[:3]]
+            output = {
+                "Metadata": {
+                    "source_file": fname,
+                    "persona": persona,
+                    "job_to_be_done": job
+                },
+                "Extracted Sections": [
+                    {
+                        "level": s['level'],
+                        "text": s['text'],
+                        "page": s['page'],
+                        "importance_rank": int(i+1),
+                        "similarity": float(sim),
+                        "explanation": f"Cosine similarity to persona/job: {sim:.3f}"
+                    } for i, (s, sim) in enumerate(ranked_sections)
+                ],
+                "Sub-section Analysis": []
+            }
+            # Fine-grained analysis for top N
+            for s in top_sections:
+                highlights, summary = analyze_subsections(subsection_text(d, s), query_vec, model, embeddings=paras_table)
+                output["Sub-section Analysis"].append({
+                    "section": s['text'],
+                    "highlights": highlights,
+                    "summary": summary
+                })
+            outputs.append((fname, output))
+        results.append(outputs)
+    metrics.add_time('summarize', time.perf_counter() - t0)
+    unique = len(sections_table) + len(paras_table)
+    encoded = sections_table.encoded + paras_table.encoded
+    requested = sections_table.requested + paras_table.requested
+    encode_sec = sections_table.encode_sec + paras_table.encode_sec
+    print(f"[INFO] Embedded {encoded} of {unique} unique texts ({requested} requested) across {len(docs)} documents "
+          f"and {len(queries)} queries in 2 encode passes, {encoded / encode_sec if encode_sec > 0 else 0:.0f} texts/sec")
+    if store is not None:
+        store.flush()
+        stats = store.summary()
+        print(f"[INFO] Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']}), {stats['rows']} vectors stored")
+    return results
+
+def rank_documents(docs, persona, job, model, batch_size=ENCODE_BATCH_SIZE, store=None, sections_table=None, bodies=None,
+                   metrics=None):
+    """Ranks (fname, outline JSON) pairs for one persona/job; see rank_queries. Returns [(fname, output dict)]."""
+    return rank_queries(docs, [(persona, job)], model, batch_size=batch_size, store=store, sections_table=sections_table,
+                        bodies=bodies, metrics=metrics)[0]
+
+def write_corpus_top(output_dir, persona, job, index, top):
+    corpus_output = {
+        "Metadata": {"persona": persona, "job_to_be_done": job, "documents": len(index.sources), "sections": len(index)},
+        "Corpus Top Sections": top
+    }
+    with open(os.path.join(output_dir, 'corpus_challenge1b_output.json'), 'w', encoding='utf-8') as f:
+        json.dump(corpus_output, f, ensure_ascii=False, indent=2)
+
+def explainability_block(output, runtime, mem_peak=None, stages=None):
+    # Attached to every Round 1B output, by the CLI (write_outputs) and the web app alike
+    return {
+        'heuristics': [
+            'Semantic similarity using all-MiniLM-L6-v2',
+            'Section ranking by cosine similarity to persona/job',
+            'Fine-grained sub-section analysis',
+            'Explainable similarity and highlights',
+            'Batch processing, offline, CPU-only',
+            'Strict output directory: /output',
+            'Model size <200MB, runtime <10s, RAM <200MB'
+        ],
+        'compliance': {
+            'output_dir': '/output',
+            'cpu_only': True,
+            'offline': True,
+            'model_size_mb': 80,
+            'runtime_sec': round(runtime,2),
+            'mem_peak_mb': round(mem_peak,1) if mem_peak is not None else None,
+            'stage_sec': stages or {},
+            'docker_platform': 'linux/amd64',
+            'no_gpu': True
+        },
+        'signals_summary': f"{len(output['Extracted Sections'])} sections ranked, {sum(len(s['highlights']) for s in output['Sub-section Analysis'])} highlights generated"
+    }
+
+def write_outputs(outputs, output_dir, total_time, metrics=None):
+    mem_peak = metrics.peak_rss_mb if metrics is not None else None
+    stages = metrics.stage_seconds() if metrics is not None else {}
+    for fname, output in outputs:
+        output['explainability_and_compliance'] = explainability_block(output, total_time, mem_peak, stages)
+        out_path = os.path.join(output_dir, fname.replace('.json', '_challenge1b_output.json'))
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+def process_persona(input_dir, output_dir, persona, job, batch_size=ENCODE_BATCH_SIZE, model=None, store=None,
+                    index=None, corpus_top_k=0, index_mode='auto', metrics=None):
+    """
+    Uses all-MiniLM-L6-v2 (~80MB) for embedding; see rank_queries for the batching.
+    With a SectionIndex and corpus_top_k, the index is synced with input_dir (reusing the phase 1
+    embeddings) and the corpus-wide top sections go to corpus_challenge1b_output.json.
+    Ensures total runtime <10s for 50-page docs (typical). Warns if exceeded.
+    """
+    [(_, outputs)] = process_queries(input_dir, output_dir, [(persona, job)], batch_size=batch_size, model=model,
+                                     store=store, index=index, corpus_top_k=corpus_top_k, index_mode=index_mode,
+                                     subdirs=False, metrics=metrics)
+    return outputs
+
+def load_queries(path):
+    """Reads persona/job pairs from a JSON list (or JSON Lines) of {"persona": ..., "job": ...} objects;
+    "job_to_be_done" is accepted for "job", and an optional "id" names the query's output folder."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = json.load(f)
+    return [(item['persona'], item.get('job', item.get('job_to_be_done', '')), item.get('id')) for item in items]
+
+def query_dir_name(i, persona, query_id=None):
+    # One folder per query: its id if given, else its position and persona
+    if query_id:
+        return re.sub(r'[^\w.-]+', '-', str(query_id)).strip('-') or f'{i + 1:03d}'
+    return f"{i + 1:03d}-{re.sub(r'[^a-z0-9]+', '-', persona.lower()).strip('-')[:40]}"
+
+def process_queries(input_dir, output_dir, queries, batch_size=ENCODE_BATCH_SIZE, model=None, store=None,
+                    index=None, corpus_top_k=0, index_mode='auto', subdirs=True, metrics=None, docs=None, bodies=None,
+                    signatures=None):
+    """
+    Runs many persona/job queries over the same corpus in one pass: model load, JSON parsing and section
+    embedding happen once, and all queries are scored with one similarity matrix (see rank_queries).
+    queries are (persona, job) or (persona, job, id) tuples; each query's outputs go to its own folder
+    under output_dir (named by id, else number and persona) unless subdirs is False.
+    metrics (an instrumentation.Metrics) collects stage timings, counters and sampled peak RSS; without one,
+    a private Metrics covers the call. Either way the compliance block reports them.
+    docs ((fname, outline JSON) pairs, with bodies and index signatures) skips reading input_dir, so an
+    in-process Round 1A run hands its outlines over without writing and re-parsing them (cli.py pipeline).
+    Returns [(output folder, [(fname, output dict)])].
+    """
+    own = metrics is None
+    if own:
+        metrics = Metrics('round1b').start()
+    try:
+        return _process_queries(input_dir, output_dir, queries, batch_size, model, store, index, corpus_top_k,
+                                index_mode, subdirs, metrics, docs, bodies, signatures)
+    finally:
+        if own:
+            metrics.finish()
+
+def _process_queries(input_dir, output_dir, queries, batch_size, model, store, index, corpus_top_k, index_mode,
+                     subdirs, metrics, docs, bodies, signatures):
+    t0 = time.time()
+    if model is None:
+        with metrics.stage('model_load'):
+            model = load_model()
+    if docs is None:
+        with metrics.stage('load'):
+            docs = load_outlines(input_dir)
+            # Outlines written with round1a --section-text carry section bodies, read lazily for the top sections
+            bodies = [open_section_text(input_dir, doc) for _, doc in docs]
+    queries = [tuple(q) + (None,) * (3 - len(q)) for q in queries]
+    texts = [query_text(persona, job) for persona, job, _ in queries]
+    metrics.count('documents', len(docs))
+    metrics.count('queries', len(queries))
+    metrics.count('sections', sum(len(doc.get('outline', [])) for _, doc in docs))
+    with metrics.stage('embed'):
+        sections_table = section_embeddings(docs, texts, model, batch_size=batch_size, store=store)
+    record_table(metrics, sections_table, batch_size)
+    results = rank_queries(docs, [(persona, job) for persona, job, _ in queries], model, batch_size=batch_size,
+                           store=store, sections_table=sections_table, bodies=bodies, metrics=metrics)
+    folders = [os.path.join(output_dir, query_dir_name(i, persona, query_id)) if subdirs else output_dir
+               for i, (persona, _, query_id) in enumerate(queries)]
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    if index is not None and corpus_top_k:
+        with metrics.stage('index'):
+            changed = update_section_index(index, input_dir, docs, sections_table, signatures)
+            query_vecs = sections_table.lookup(texts)
+            print(f"[INFO] Section index: {len(index)} sections from {len(index.sources)} documents ({changed} re-indexed)")
+            for folder, (persona, job, _), query_vec in zip(folders, queries, query_vecs):
+                write_corpus_top(folder, persona, job, index, corpus_top_sections(index, query_vec, corpus_top_k, mode=index_mode))
     t1 = time.time()
     total_time = t1 - t0
     if total_time > 10:
         print(f"[WARN] Persona-driven pipeline runtime exceeded 10s: {total_time:.2f}s")
-        output['explainability_and_compliance'] = {
-            'heuristics': [
-                'Semantic similarity using all-MiniLM-L6-v2',
-                'Section ranking by cosine similarity to persona/job',
-                'Fine-grained sub-section analysis',
-                'Explainable similarity and highlights',
-                'Batch processing, offline, CPU-only',
-                'Strict output directory: /output',
-                'Model size <200MB, runtime <10s, RAM <200MB'
-            ],
-            'compliance': {
-                'output_dir': '/output',
-                'cpu_only': True,
-                'offline': True,
-                'model_size_mb': 80,
-                'runtime_sec': round(total_time,2),
-                'docker_platform': 'linux/amd64',
-                'no_gpu': True
-            },
-            'signals_summary': f"{len(output['Extracted Sections'])} sections ranked, {sum(len(s['highlights']) for s in output['Sub-section Analysis'])} highlights generated"
-        }
-        out_path = os.path.join(output_dir, fname.replace('.json', '_challenge1b_output.json'))
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
+    with metrics.stage('write'):
+        for folder, outputs in zip(folders, results):
+            write_outputs(outputs, folder, total_time, metrics)
+    if subdirs:
+        print(f"[INFO] {len(queries)} queries over {len(docs)} documents in {total_time:.2f}s")
+    return list(zip(folders, results))
+
+def add_arguments(parser, io=True):
+    # Round 1B options, shared with cli.py (rank, and pipeline with io=False)
+    if io:
+        parser.add_argument('--input', default='/app/output', help='Input directory of JSONs from Round 1A')
+        parser.add_argument('--output', default='/app/output', help='Output directory for 1B JSONs')
+    parser.add_argument('--persona', help='Persona description')
+    parser.add_argument('--job', help='Job-to-be-done description')
+    parser.add_argument('--queries', default=None,
+                        help='JSON/JSONL file of {"persona", "job"} pairs, ranked together; outputs go to one folder per query')
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=BACKENDS, help='Embedding backend')
+    parser.add_argument('--model-dir', default=None, help='Local SentenceTransformer directory (default: MODEL_NAME)')
+    parser.add_argument('--onnx-dir', default=None, help='Exported ONNX graphs (default: onnx_models/<model>)')
+    parser.add_argument('--embedding-cache', default=None, help='Directory for the persistent embedding cache (off if unset)')
+    parser.add_argument('--embedding-cache-dtype', default=DEFAULT_DTYPE, choices=['float32', 'float16'])
+    parser.add_argument('--embedding-cache-max-rows', type=int, default=None, help='Compact the cache to this many most recently used vectors')
+    parser.add_argument('--corpus-top-k', type=int, default=0, help='Also write the top K sections across all documents')
+    parser.add_argument('--section-index', default=None, help='Directory to persist the corpus section index (in memory if unset)')
+    parser.add_argument('--index-mode', default='auto', choices=['auto', 'exact', 'ivf'])
+    parser.add_argument('--metrics', default=None, help='Write stage metrics (JSON, or Prometheus text for .prom)')
+    parser.add_argument('--profile', default=None, help='Dump a cProfile of the run to this file')
+    return parser
+
+def check_arguments(parser, args):
+    if not args.queries and (args.persona is None or args.job is None):
+        parser.error('--persona and --job are required unless --queries is given')
+
+def setup_ranking(args, metrics):
+    # Model, embedding cache and (with --corpus-top-k) section index for the parsed CLI options
+    with metrics.stage('model_load'):
+        model = load_model(args.model_dir, backend=args.backend, onnx_dir=args.onnx_dir)
+    model_name = embedding_model_name(args.model_dir, args.backend)
+    store = get_embedding_store(args.embedding_cache, model_name=model_name,
+                                dtype=args.embedding_cache_dtype, max_rows=args.embedding_cache_max_rows)
+    index = None
+    if args.corpus_top_k:
+        index = SectionIndex.load(args.section_index, model_name) if args.section_index else SectionIndex(model=model_name)
+    return model, store, index
+
+def run_queries(args, model, store, index, metrics, **inputs):
+    # --queries: one folder per query; --persona/--job: outputs straight into --output
+    if args.queries:
+        return process_queries(args.input, args.output, load_queries(args.queries), model=model, store=store,
+                               index=index, corpus_top_k=args.corpus_top_k, index_mode=args.index_mode,
+                               metrics=metrics, **inputs)
+    return process_queries(args.input, args.output, [(args.persona, args.job)], model=model, store=store,
+                           index=index, corpus_top_k=args.corpus_top_k, index_mode=args.index_mode,
+                           subdirs=False, metrics=metrics, **inputs)
+
+def finish_run(args, index, metrics):
+    if index is not None and args.section_index:
+        with metrics.stage('index_save'):
+            index.save(args.section_index)
+    metrics.finish()
+    stages = ', '.join(f'{stage} {sec:.2f}s' for stage, sec in metrics.stage_seconds().items())
+    print(f"[INFO] stages: {stages}; peak RSS {metrics.peak_rss_mb:.1f}MB")
+    if args.metrics:
+        write_metrics(args.metrics, [metrics.to_dict()])
+        print(f"[INFO] Metrics written to {args.metrics}")
+
+class StandingQueries:
+    """
+    The CLI's persona/job queries, kept loaded for watch mode (watcher.py): model, embedding cache and
+    section index stay warm, and each round ranks only the outlines that were added or changed. The corpus
+    top-k still covers every document, through the incrementally updated index. key identifies the queries
+    and model, so the watcher re-ranks everything when they change.
+    """
+    def __init__(self, args, metrics):
+        self.args = args
+        self.model, self.store, self.index = setup_ranking(args, metrics)
+        self.queries = load_queries(args.queries) if args.queries else [(args.persona, args.job, None)]
+        self.folders = ([os.path.join(args.output, query_dir_name(i, persona, query_id))
+                         for i, (persona, _, query_id) in enumerate(self.queries)] if args.queries else [args.output])
+        self.key = hashlib.sha256(json.dumps([self.queries, embedding_model_name(args.model_dir, args.backend),
+                                              args.corpus_top_k]).encode('utf-8')).hexdigest()[:16]
+
+    def rank(self, outline_dir, fnames, signatures):
+        # Ranks the named outlines (in outline_dir) for every query; signatures lists the whole corpus
+        metrics = Metrics('round1b').start()
+        with metrics.stage('load'):
+            docs = []
+            for fname in fnames:
+                with open(os.path.join(outline_dir, fname), encoding='utf-8') as f:
+                    docs.append((fname, json.load(f)))
+            bodies = [open_section_text(outline_dir, doc) for _, doc in docs]
+        process_queries(outline_dir, self.args.output, self.queries, model=self.model, store=self.store,
+                        index=self.index, corpus_top_k=self.args.corpus_top_k, index_mode=self.args.index_mode,
+                        subdirs=bool(self.args.queries), metrics=metrics, docs=docs, bodies=bodies, signatures=signatures)
+        if self.index is not None and self.args.section_index:
+            with metrics.stage('index_save'):
+                self.index.save(self.args.section_index)
+        return metrics.finish().to_dict()
+
+    def remove(self, fname):
+        for folder in self.folders:
+            path = os.path.join(folder, fname.replace('.json', '_challenge1b_output.json'))
+            if os.path.exists(path):
+                os.remove(path)
+
+def main(args):
+    metrics = Metrics('round1b', profile_path=args.profile).start()
+    model, store, index = setup_ranking(args, metrics)
+    run_queries(args, model, store, index, metrics)
+    finish_run(args, index, metrics)
+    return 0
 
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--input', default='/app/output', help='Input directory of JSONs from Round 1A')
-    parser.add_argument('--output', default='/app/output', help='Output directory for 1B JSONs')
-    parser.add_argument('--persona', required=True, help='Persona description')
-    parser.add_argument('--job', required=True, help='Job-to-be-done description')
+    parser = add_arguments(argparse.ArgumentParser())
     args = parser.parse_args()
-    process_persona(args.input, args.output, args.persona, args.job)
+    check_arguments(parser, args)
+    raise SystemExit(main(args))
@@ -0,0 +1,222 @@
+import os
+import json
+import numpy as np
+
+# --- Index config ---
+IVF_MIN_ROWS = 50000  # below this, search='auto' scans every vector
+IVF_NPROBE = 16  # inverted lists scanned per query
+IVF_TRAIN_SAMPLE = 32  # training rows per list
+IVF_TRAIN_ITERATIONS = 10
+IVF_RETRAIN_GROWTH = 4  # retrain lists once the index has grown this many times since training
+ASSIGN_CHUNK = 16384  # rows per centroid-assignment matmul
+
+
+def top_k(scores, k):
+    # Indices of the k highest scores, best first (ties by lower index), without a full sort
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _write_atomic(path, write):
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class SectionIndex:
+    """
+    Corpus-wide cosine index over Round 1A outline sections.
+    Vectors are L2-normalized rows in one growable float32 buffer; each row carries its source file,
+    level, text and page. Exact search is one matrix-vector product plus argpartition. IVF search
+    clusters the rows into ~sqrt(n) inverted lists (KMeans on a sample) and scans only the nprobe lists
+    whose centroids are closest to the query; rows added later are assigned to their nearest list
+    without retraining until the index has grown IVF_RETRAIN_GROWTH times. Removed rows are masked
+    until the next save, which compacts them away. model names the embedding model/backend that made the
+    vectors (round1b.embedding_model_name); a saved index made by another model is rebuilt on load.
+    """
+    def __init__(self, dim=None, model=None):
+        self.dim = dim
+        self.model = model
+        self.n = 0
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.sections = []
+        self.sources = {}  # source file -> signature (e.g. [mtime_ns, size]) of the indexed version
+        self.centroids = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._lists = None  # (order, offsets) CSR view of assign, rebuilt lazily
+
+    def __len__(self):
+        return int(self.alive[:self.n].sum())
+
+    @property
+    def vectors(self):
+        return self._vectors[:self.n]
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    # --- updates ---
+    def add(self, source, sections, vectors, signature=None):
+        if not len(sections):
+            self.sources[source] = signature
+            return
+        vectors = normalize_rows(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        end = self.n + len(vectors)
+        if end > len(self._vectors):
+            # Double the buffer so repeated adds stay amortized O(n)
+            grown = np.zeros((max(end, 2 * len(self._vectors), 1024), self.dim), dtype=np.float32)
+            grown[:self.n] = self.vectors
+            self._vectors = grown
+            self.alive = np.concatenate([self.alive, np.zeros(len(grown) - len(self.alive), dtype=bool)])
+        self._vectors[self.n:end] = vectors
+        self.alive[self.n:end] = True
+        self.sections.extend({'source_file': source, 'level': s.get('level'), 'text': s['text'], 'page': s.get('page')}
+                             for s in sections)
+        if self.trained:
+            self.assign = np.concatenate([self.assign, self._nearest_list(vectors)])
+            self._lists = None
+        self.n = end
+        self.sources[source] = signature
+        if self.trained and self.n >= IVF_RETRAIN_GROWTH * self.trained_rows:
+            self.train()
+
+    def remove(self, source):
+        rows = [i for i, s in enumerate(self.sections) if s['source_file'] == source]
+        self.alive[rows] = False
+        self.sources.pop(source, None)
+
+    # --- IVF ---
+    def _nearest_list(self, vectors):
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK):
+            chunk = vectors[start:start + ASSIGN_CHUNK]
+            out[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return out
+
+    def train(self, nlist=None, seed=0):
+        """Clusters the live rows into nlist (default sqrt(n)) inverted lists."""
+        live = np.flatnonzero(self.alive[:self.n])
+        nlist = min(nlist or max(1, int(np.sqrt(len(live)))), len(live))
+        if not nlist:
+            return
+        rng = np.random.default_rng(seed)
+        sample = live if len(live) <= nlist * IVF_TRAIN_SAMPLE else np.sort(rng.choice(live, nlist * IVF_TRAIN_SAMPLE, replace=False))
+        from sklearn.cluster import KMeans  # only IVF training needs sklearn
+        kmeans = KMeans(n_clusters=nlist, n_init=1, max_iter=IVF_TRAIN_ITERATIONS, random_state=seed)
+        kmeans.fit(self.vectors[sample])
+        self.centroids = normalize_rows(kmeans.cluster_centers_)
+        self.assign = self._nearest_list(self.vectors)
+        self.trained_rows = self.n
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assign, kind='stable').astype(np.int64)
+            offsets = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    # --- search ---
+    def search(self, queries, k=10, mode='auto', nprobe=IVF_NPROBE):
+        """
+        Top-k sections for each query vector (one vector or a (q, dim) matrix). mode is exact, ivf or
+        auto (ivf from IVF_MIN_ROWS rows, training the lists on first use). Returns, per query, a list of
+        (similarity, section dict) best first; a single vector returns just that list.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = normalize_rows(queries.reshape(-1, queries.shape[-1]))
+        if mode == 'auto':
+            mode = 'ivf' if self.n >= IVF_MIN_ROWS else 'exact'
+        if mode == 'ivf' and not self.trained:
+            self.train()
+        results = []
+        if mode == 'exact' or not self.n:
+            # One product for all queries; dead rows can never win
+            scores = queries @ self.vectors.T if self.n else np.zeros((len(queries), 0), dtype=np.float32)
+            scores[:, ~self.alive[:self.n]] = -np.inf
+            for row_scores in scores:
+                best = top_k(row_scores, k)
+                results.append([(float(row_scores[i]), self.sections[i]) for i in best if np.isfinite(row_scores[i])])
+        else:
+            order, offsets = self._inverted_lists()
+            probes = queries @ self.centroids.T
+            for q, centroid_scores in zip(queries, probes):
+                lists = top_k(centroid_scores, nprobe)
+                rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+                rows = rows[self.alive[rows]]
+                scores = self.vectors[rows] @ q
+                best = top_k(scores, k)
+                results.append([(float(scores[i]), self.sections[rows[i]]) for i in best])
+        return results[0] if single else results
+
+    # --- persistence ---
+    def save(self, root):
+        """Writes the live rows to root (vectors.npy, sections.json, ivf.npz), compacting removed ones."""
+        os.makedirs(root, exist_ok=True)
+        live = np.flatnonzero(self.alive[:self.n])
+        if len(live) != self.n:
+            self._vectors = self.vectors[live].copy()
+            self.alive = np.ones(len(live), dtype=bool)
+            self.sections = [self.sections[i] for i in live.tolist()]
+            if self.trained:
+                self.assign = self.assign[live]
+                self._lists = None
+            self.n = len(live)
+        _write_atomic(os.path.join(root, 'vectors.npy'), lambda f: np.save(f, self.vectors))
+        if self.trained:
+            _write_atomic(os.path.join(root, 'ivf.npz'), lambda f: np.savez(
+                f, centroids=self.centroids, assign=self.assign, trained_rows=np.int64(self.trained_rows)))
+        elif os.path.exists(os.path.join(root, 'ivf.npz')):
+            os.remove(os.path.join(root, 'ivf.npz'))
+        # Written last: load trusts vectors/ivf only when their row count matches
+        meta = {'model': self.model, 'dim': self.dim, 'rows': self.n, 'sources': self.sources, 'sections': self.sections}
+        _write_atomic(os.path.join(root, 'sections.json'),
+                      lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+    @classmethod
+    def load(cls, root, model=None):
+        # Vectors from another model (or dimension) cannot be searched with this model's queries
+        index = cls(model=model)
+        try:
+            with open(os.path.join(root, 'sections.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(root, 'vectors.npy'))
+        except (FileNotFoundError, ValueError):
+            return index
+        if len(vectors) != meta['rows']:
+            print(f"[WARN] Section index at {root} is inconsistent; rebuilding")
+            return index
+        if model is not None and meta.get('model') != model:
+            print(f"[WARN] Section index at {root} was built with {meta.get('model')}, not {model}; rebuilding")
+            return index
+        index.dim = meta['dim']
+        index._vectors = vectors
+        index.n = len(vectors)
+        index.alive = np.ones(index.n, dtype=bool)
+        index.sections = meta['sections']
+        index.sources = meta['sources']
+        ivf_path = os.path.join(root, 'ivf.npz')
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as data:
+                if len(data['assign']) == index.n:
+                    index.centroids = data['centroids']
+                    index.assign = data['assign']
+                    index.trained_rows = int(data['trained_rows'])
+        return index
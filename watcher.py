@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import signal
+import threading
+import round1a_structure_extractor as round1a
+from outline_cache import file_sha256, config_hash
+from instrumentation import MetricsRegistry, write_metrics
+
+# --- Watch config ---
+WATCH_INTERVAL = 2.0  # seconds between directory scans
+WATCH_SETTLE_SEC = 1.0  # PDFs modified more recently than this may still be copying; a later scan picks them up
+STATE_DIR = '.watch'  # under the output directory unless given: manifest, embedding cache, section index
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def scan_pdfs(input_dir):
+    # {fname: [mtime_ns, size]} from one scandir pass (no per-file open)
+    stats = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith('.pdf') and entry.is_file():
+                st = entry.stat()
+                stats[entry.name] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+
+def outline_name(fname):
+    # Same naming as round1a.process_directory
+    return fname.replace('.pdf', '.json')
+
+
+class Manifest:
+    """
+    Persistent per-PDF state of a watched directory: file stats, content SHA-256, outline name and
+    status. A scan stats every PDF but hashes only the ones whose stats changed, so a touched but
+    identical file is not re-extracted. It also records the extractor config and the standing queries
+    the outputs were made with, so changing either reprocesses the archive once.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.data = {'version': MANIFEST_VERSION, 'extractor': None, 'queries': None, 'files': {}}
+        self.dirty = False
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.data = data
+        else:
+            print(f"[WARN] Manifest {path} has an old layout; reprocessing every PDF")
+
+    @property
+    def files(self):
+        return self.data['files']
+
+    def diff(self, input_dir, stats, settle=WATCH_SETTLE_SEC):
+        """(changed [(fname, stat, sha256)], removed [fname]) of a scan against the manifest."""
+        now = time.time_ns()
+        changed = []
+        for fname, stat in sorted(stats.items()):
+            entry = self.files.get(fname)
+            if entry is not None and entry['stat'] == stat:
+                continue
+            if now - stat[0] < settle * 1e9:
+                continue
+            sha = file_sha256(os.path.join(input_dir, fname))
+            if entry is not None and entry['sha256'] == sha:
+                entry['stat'] = stat  # touched or copied over with the same content
+                self.dirty = True
+                continue
+            changed.append((fname, stat, sha))
+        removed = [fname for fname in self.files if fname not in stats]
+        return changed, removed
+
+    def record(self, fname, stat, sha, outline, error=None):
+        self.files[fname] = {'stat': stat, 'sha256': sha, 'outline': outline, 'status': 'failed' if error else 'ok',
+                             'error': error, 'processed_at': round(time.time(), 3)}
+        self.dirty = True
+
+    def invalidate(self):
+        # Every PDF counts as changed on the next scan; entries stay so deletions are still noticed
+        for entry in self.files.values():
+            entry['stat'] = entry['sha256'] = None
+        self.dirty = True
+
+    def outlines(self):
+        # {outline name: content hash} of the successfully extracted PDFs (section index signatures)
+        return {e['outline']: e['sha256'] for e in self.files.values() if e['status'] == 'ok' and e['sha256']}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f'{self.path}.tmp-{os.getpid()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+class Watcher:
+    """
+    Continuous Round 1A over input_dir. Each poll() extracts only new or changed PDFs (in this process,
+    or a worker pool with workers > 1) into output_dir with their section sidecars, and drops the outputs
+    of deleted ones, so a scan costs one stat per archived PDF. The span/outline caches and clustering
+    centers stay warm between polls. With a ranker (round1b.StandingQueries), new outlines are ranked
+    for the standing persona queries right away.
+    """
+    def __init__(self, input_dir, output_dir, state_dir=None, workers=1, timeout=None,
+                 shard_threshold=round1a.SHARD_PAGE_THRESHOLD, shard_workers=None, cache_dir=None,
+                 cache_max_mb=round1a.DEFAULT_CACHE_MAX_MB, ranker=None, metrics_path=None, settle=WATCH_SETTLE_SEC):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.workers = workers
+        self.ranker = ranker
+        self.metrics_path = metrics_path
+        self.settle = settle
+        self.options = (timeout, shard_threshold, shard_workers, cache_dir, cache_max_mb, False, None, True, None)
+        self.registry = MetricsRegistry()
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(state_dir or os.path.join(output_dir, STATE_DIR), MANIFEST_FILE))
+        extractor = config_hash(round1a.extractor_config())
+        if self.manifest.data['extractor'] != extractor:
+            if self.manifest.files:
+                print("[INFO] Extractor config changed; reprocessing every PDF")
+                self.manifest.invalidate()
+            self.manifest.data['extractor'] = extractor
+        # New or edited standing queries: rank every existing outline once
+        self.rerank = ranker is not None and self.manifest.data['queries'] != ranker.key
+
+    def _drop_outputs(self, outline):
+        prefix = os.path.join(self.output_dir, os.path.splitext(outline)[0] + round1a.SECTION_TEXT_SUFFIX)
+        for path in (os.path.join(self.output_dir, outline),) + round1a.section_text_paths(prefix):
+            if os.path.exists(path):
+                os.remove(path)
+        if self.ranker is not None:
+            self.ranker.remove(outline)
+
+    def poll(self):
+        """One scan: extract new/changed PDFs, drop deleted ones, rank. Returns a summary, or None if idle."""
+        changed, removed = self.manifest.diff(self.input_dir, scan_pdfs(self.input_dir), self.settle)
+        rerank = self.rerank
+        if not changed and not removed and not rerank:
+            if self.manifest.dirty:
+                self.manifest.save()
+            return None
+        t0 = time.time()
+        for fname in removed:
+            self._drop_outputs(self.manifest.files.pop(fname)['outline'])
+            self.manifest.dirty = True
+        jobs = [(os.path.join(self.input_dir, fname), os.path.join(self.output_dir, outline_name(fname)))
+                for fname, _, _ in changed]
+        if self.workers > 1 and len(jobs) > 1:
+            results = round1a._run_pool(jobs, self.workers, self.options, 2 * self.workers)
+        else:
+            results = [round1a.extract_to_file(pdf_path, out_path, *self.options) for pdf_path, out_path in jobs]
+        results = {pdf_path: (error, run) for pdf_path, error, _, _, run in results}
+        extracted, failed = [], 0
+        for (fname, stat, sha), (pdf_path, out_path) in zip(changed, jobs):
+            error, run = results[pdf_path]
+            self.registry.add('round1a', run)
+            self.manifest.record(fname, stat, sha, os.path.basename(out_path), error)
+            if error:
+                print(f"[ERROR] {fname}: {error}")
+                self._drop_outputs(os.path.basename(out_path))
+                failed += 1
+            else:
+                extracted.append(os.path.basename(out_path))
+        if self.ranker is not None:
+            outlines = self.manifest.outlines()
+            to_rank = sorted(outlines) if rerank else extracted
+            if to_rank or removed:
+                self.registry.add('round1b', self.ranker.rank(self.output_dir, to_rank, outlines))
+            self.manifest.data['queries'] = self.ranker.key
+            self.rerank = False
+        # Saved last: if the process dies mid-poll, the next start redoes this poll's files
+        self.manifest.save()
+        summary = {'extracted': len(extracted), 'failed': failed, 'removed': len(removed),
+                   'documents': len(self.manifest.outlines()), 'sec': round(time.time() - t0, 2)}
+        print(f"[INFO] {summary['extracted']} extracted, {summary['failed']} failed, {summary['removed']} removed "
+              f"in {summary['sec']}s; {summary['documents']} documents in the corpus")
+        if self.metrics_path:
+            write_metrics(self.metrics_path, self.registry.runs())
+        return summary
+
+    def run(self, interval=WATCH_INTERVAL, once=False):
+        # Polls until SIGTERM/SIGINT; a signal lets the current poll finish so the manifest stays consistent
+        stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: stop.set())
+        print(f"[INFO] Watching {self.input_dir} every {interval}s ({len(self.manifest.files)} PDFs in the manifest)")
+        while True:
+            self.poll()
+            if once or stop.wait(interval):
+                break
+        print("[INFO] Watcher stopped")